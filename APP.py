@@ -1,14 +1,26 @@
 import streamlit as st
 from supabase import create_client, Client
-import urllib.request, json, ssl
+from postgrest.exceptions import APIError
+import json, zlib, base64
+import urllib3
 import pandas as pd
-from datetime import datetime, timedelta
+import numpy as np
+import pyarrow as pa, pyarrow.parquet as pq
+from datetime import datetime, timedelta, date
 import pytz
 import uuid
 import time
+import re, os
+import threading, math, atexit, random
+from email.utils import parsedate_to_datetime
+from collections import OrderedDict, deque, defaultdict
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from contextlib import contextmanager
+from functools import wraps, lru_cache
+from bisect import bisect_left
 
-ssl_context = ssl._create_unverified_context()
 st.set_page_config(page_title="TETRADES", page_icon="▲", layout="wide", initial_sidebar_state="collapsed")
+rerun_started = time.perf_counter()
 
 st.markdown("""
 <style>
@@ -214,6 +226,7 @@ html, body, [data-testid="stAppViewContainer"] {
 }
 .metric-change-up { color: var(--green); font-size: 0.75rem; font-family: var(--font-mono); }
 .metric-change-dn { color: var(--red);   font-size: 0.75rem; font-family: var(--font-mono); }
+.metric-grid-compact { grid-template-columns: 1fr; margin-bottom: 12px; }
 
 /* ─── REPORT CONTAINER ─── */
 .report-wrapper {
@@ -312,6 +325,7 @@ html, body, [data-testid="stAppViewContainer"] {
 .rank-table tbody td.analyst { color: var(--text-primary); }
 .rank-table tbody td.points { color: var(--gold); }
 .rank-1 td.analyst { color: var(--gold) !important; }
+.rank-me td { background: var(--bg-elevated); }
 
 /* ─── INPUT OVERRIDE ─── */
 [data-testid="stTextInput"] input {
@@ -530,6 +544,7 @@ hr { border-color: var(--border) !important; margin: 24px 0 !important; }
 
 </style>
 """, unsafe_allow_html=True)
+css_ms = (time.perf_counter() - rerun_started) * 1000
 
 # ---------------------------------------------------------
 # 2. Supabase & API 설정
@@ -544,18 +559,235 @@ def init_supabase():
         st.error(f"Supabase 연결 실패: {e}")
         return None
 
+@st.cache_resource
+def init_supabase_service():
+    # 서버 전용 읽기 · 쓰기 (write-behind, 채점, MY REPORTS) 는 service_role 키로
+    # award_points 실행 · reports 쓰기는 service_role 만 가능 → 키가 없으면 시작하지 않음
+    return create_client(st.secrets["SUPABASE_URL"], st.secrets["SUPABASE_SERVICE_KEY"])
+
 try:
     supabase = init_supabase()
+    supabase_service = init_supabase_service()
     OPENAI_API_KEY = st.secrets["OPENAI_API_KEY"]
     FMP_API_KEY    = st.secrets["FMP_API_KEY"]
     ADMIN_EMAIL    = st.secrets["ADMIN_EMAIL"]
+    FMP_BASE_URL    = st.secrets.get("FMP_BASE_URL", "https://financialmodelingprep.com/stable")
+    OPENAI_BASE_URL = st.secrets.get("OPENAI_BASE_URL", "https://api.openai.com/v1")
 except Exception as e:
     st.error(f"🔑 Secrets 로딩 오류: {e}")
     st.stop()
 
+# ---------------------------------------------------------
+# 2-1. 공유 HTTP 클라이언트 (호스트별 keep-alive 풀)
+# ---------------------------------------------------------
+# host: (최대 동시 연결, connect 타임아웃, read 타임아웃)
+HTTP_LIMITS = {
+    "financialmodelingprep.com": (10, 3.0, 15.0),
+    "api.openai.com":            (8, 5.0, 60.0),
+    "*":                         (4, 5.0, 30.0),
+}
+
+HTTP_RETRIES      = int(st.secrets.get("HTTP_RETRIES", 2))          # 최초 호출 외 재시도 횟수
+BREAKER_THRESHOLD = int(st.secrets.get("BREAKER_THRESHOLD", 5))     # 연속 실패 시 차단
+BREAKER_COOLDOWN  = float(st.secrets.get("BREAKER_COOLDOWN", 30))   # 차단 유지 시간(초)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+BACKOFF_BASE, BACKOFF_CAP, RETRY_AFTER_MAX = 0.25, 4.0, 10.0
+
+UPSTREAM_REASONS = {
+    "circuit_open":       "장애가 감지되어 잠시 호출을 중단한 상태입니다",
+    "rate_limited":       "요청 한도를 초과했습니다",
+    "unavailable":        "서비스가 일시적으로 응답하지 않습니다",
+    "timeout":            "응답 시간이 초과되었습니다",
+    "connection":         "서버에 연결할 수 없습니다",
+    "stream_interrupted": "응답이 중간에 끊겼습니다",
+    "bad_response":       "응답 형식이 올바르지 않습니다",
+    "queue_full":         "요청 대기열이 가득 찼습니다",
+    "internal":           "리포트 준비 중 오류가 발생했습니다",
+}
+
+class UpstreamError(Exception):
+    # 외부 API 실패 ("찾을 수 없음" 과 구분하기 위한 사유 포함)
+    def __init__(self, host, reason, status=None):
+        super().__init__(f"{host}: {reason}" + (f" ({status})" if status else ""))
+        self.host, self.reason, self.status = host, reason, status
+
+    @property
+    def message(self):
+        return UPSTREAM_REASONS.get(self.reason, f"요청이 실패했습니다 (HTTP {self.status})" if self.status else self.reason)
+
+@st.cache_resource
+def _pinned_upstream_error():
+    # 스크립트는 rerun 마다 다시 실행됨 → 공유 객체(HttpClient 등)가 던지는 예외와
+    # except 절의 클래스가 같아지도록 최초 정의를 고정
+    return UpstreamError
+
+UpstreamError = _pinned_upstream_error()
+
+class CircuitBreaker:
+    # closed → 연속 threshold 회 실패 → open (즉시 실패) → cooldown 후 half-open: 1건만 시험 → 성공 시 closed
+    def __init__(self, threshold, cooldown):
+        self.threshold, self.cooldown = threshold, cooldown
+        self.state, self.failures, self.opened_at = "closed", 0, 0.0
+        self.trips = self.retries = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "open" and time.time() - self.opened_at >= self.cooldown:
+                self.state, self._probing = "half-open", False
+            if self.state == "closed": return True
+            if self.state == "half-open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.state, self.failures, self._probing = "closed", 0, False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == "half-open" or (self.state == "closed" and self.failures >= self.threshold):
+                self.state, self.opened_at = "open", time.time()
+                self.trips += 1
+
+def _retry_after(value):
+    # Retry-After: 초 단위 정수 또는 HTTP-date
+    if not value: return None
+    try: return max(0.0, float(value))
+    except ValueError: pass
+    try: return max(0.0, (parsedate_to_datetime(value) - datetime.now(pytz.utc)).total_seconds())
+    except (TypeError, ValueError): return None
+
+class HttpClient:
+    # 프로세스 전체가 하나의 PoolManager 를 공유 → TLS 핸드셰이크는 호스트당 최초 1회
+    # 429/5xx · 연결 오류는 지터를 둔 지수 백오프로 재시도, 호스트별 서킷 브레이커로 장애 시 즉시 실패
+    def __init__(self, limits, retries=HTTP_RETRIES, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.limits, self.retries = limits, retries
+        self.threshold, self.cooldown = threshold, cooldown
+        self._breakers = {}
+        self._lock = threading.Lock()
+        # 인증서 검증은 기본 컨텍스트 (CERT_REQUIRED + 시스템 CA)
+        self._pm = urllib3.PoolManager(num_pools=16, retries=False)
+
+    def breaker(self, host):
+        with self._lock:
+            if host not in self._breakers: self._breakers[host] = CircuitBreaker(self.threshold, self.cooldown)
+            return self._breakers[host]
+
+    def health(self):
+        return [{"host": h, "state": b.state, "consecutive_failures": b.failures, "trips": b.trips, "retries": b.retries}
+                for h, b in sorted(self._breakers.items())]
+
+    def _pool(self, url):
+        host = urllib3.util.parse_url(url).host
+        maxsize, connect, read = self.limits.get(host, self.limits["*"])
+        # block=True: 호스트별 동시 연결 수를 maxsize 로 제한 (초과 요청은 대기)
+        return self._pm.connection_from_url(url, pool_kwargs={
+            "maxsize": maxsize, "block": True, "timeout": urllib3.Timeout(connect=connect, read=read)})
+
+    def request(self, method, url, body=None, headers=None, stream=False, timeout=None, retries=None):
+        # 재시도가 끝나도 실패하면 UpstreamError. 그 밖의 4xx 는 응답을 그대로 반환
+        parsed = urllib3.util.parse_url(url)
+        host = parsed.host
+        breaker = self.breaker(host)
+        retries = self.retries if retries is None else retries
+        kw = {"timeout": timeout} if timeout else {}
+        for attempt in range(retries + 1):
+            if not breaker.allow(): raise UpstreamError(host, "circuit_open")
+            try:
+                r = self._pool(url).urlopen(method, parsed.request_uri, body=body, headers=headers, preload_content=not stream,
+                                            release_conn=not stream, pool_timeout=30, retries=False, **kw)
+            except urllib3.exceptions.HTTPError as e:
+                breaker.failure()
+                timed_out = isinstance(e, urllib3.exceptions.TimeoutError) and not isinstance(e, urllib3.exceptions.NewConnectionError)
+                # POST 읽기 타임아웃은 서버가 이미 처리했을 수 있으므로 재시도하지 않음
+                if attempt == retries or (method != "GET" and isinstance(e, urllib3.exceptions.ReadTimeoutError)):
+                    raise UpstreamError(host, "timeout" if timed_out else "connection") from e
+                delay = None
+            else:
+                if r.status not in RETRY_STATUS:
+                    breaker.success()
+                    return r
+                breaker.failure()
+                delay = _retry_after(r.headers.get("Retry-After"))
+                if stream:
+                    r.drain_conn()
+                    r.release_conn()
+                if attempt == retries or (delay or 0) > RETRY_AFTER_MAX:
+                    raise UpstreamError(host, "rate_limited" if r.status == 429 else "unavailable", r.status)
+            breaker.retries += 1
+            time.sleep(delay if delay is not None else random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt)))
+
+@st.cache_resource
+def get_http():
+    return HttpClient(HTTP_LIMITS)
+
+http = get_http()
+
+# ---------------------------------------------------------
+# 2-2. 성능 계측 (구간별 소요 시간 링 버퍼)
+# ---------------------------------------------------------
+class Telemetry:
+    # 최근 maxlen 개 구간 기록 (ts, name, ms, ok). log_path 가 있으면 JSON lines 로도 남김
+    def __init__(self, maxlen=20000, log_path=None):
+        self._spans = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self._log = open(log_path, "a", buffering=1, encoding="utf-8") if log_path else None
+
+    def record(self, name, ms, ok=True):
+        row = (time.time(), name, round(ms, 2), ok)
+        with self._lock:
+            self._spans.append(row)
+            if self._log: self._log.write(json.dumps(dict(zip(("ts", "span", "ms", "ok"), row))) + "\n")
+
+    @contextmanager
+    def span(self, name):
+        # st.rerun / st.stop 은 BaseException 이라 오류로 세지 않음
+        t0, ok = time.perf_counter(), True
+        try:
+            yield
+        except Exception:
+            ok = False
+            raise
+        finally:
+            self.record(name, (time.perf_counter() - t0) * 1000, ok)
+
+    def summary(self):
+        with self._lock:
+            rows = list(self._spans)
+        if not rows: return pd.DataFrame()
+        df = pd.DataFrame(rows, columns=["ts", "span", "ms", "ok"])
+        g = df.groupby("span")
+        out = g["ms"].quantile([0.5, 0.95, 0.99]).unstack()
+        out.columns = ["p50_ms", "p95_ms", "p99_ms"]
+        out.insert(0, "calls", g.size())
+        out["error_rate"] = 1 - g["ok"].mean()
+        return out.round(2).sort_values("p95_ms", ascending=False)
+
+@st.cache_resource
+def get_telemetry():
+    return Telemetry(log_path=st.secrets.get("TELEMETRY_LOG"))
+
+telemetry = get_telemetry()
+telemetry.record("ui.css", css_ms)
+
+def timed(name):
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with telemetry.span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
 # ---------------------------------------------------------
 # 3. 비즈니스 로직
 # ---------------------------------------------------------
+@timed("supabase.profile")
 def get_user_profile(user):
     res = supabase.table('profiles').select("*").eq('id', user.id).execute()
     if res.data: return res.data[0]
@@ -572,29 +804,508 @@ def update_profile(user_id, updates):
     supabase.table('profiles').update(updates).eq('id', user_id).execute()
     st.session_state["profile"].update(updates)
 
-def save_prediction(user_id, ticker, price, verdict):
+# 일시 오류로 보는 SQLSTATE 계열: 연결(08) · 트랜잭션 롤백(40) · 자원 부족(53) · 운영자 개입/타임아웃(57) · 시스템(58)
+TRANSIENT_SQLSTATE = ("08", "40", "53", "57", "58")
+TRANSIENT_PGRST = ("PGRST000", "PGRST001", "PGRST002", "PGRST003")   # DB 연결 · 풀 타임아웃
+DEAD_LETTER_MAX = 500
+
+def is_transient_db_error(e):
+    # 네트워크 오류 · 5xx · 429 · 위 코드는 재시도, 그 밖의 PostgREST 오류 (4xx: RLS · FK · 형식)는 영구 실패
+    if not isinstance(e, APIError): return True
+    code = str(e.code or "")
+    if not code: return True                         # 코드 없는 오류 응답 (게이트웨이 등) → 상태 불명, 재시도
+    if code.isdigit() and len(code) == 3: return code == "429" or int(code) >= 500   # JSON 이 아닌 응답 → HTTP 상태
+    return code.startswith(TRANSIENT_SQLSTATE) or code in TRANSIENT_PGRST
+
+class WriteBehind:
+    # 리포트 · 예측 insert / 포인트 지급을 큐에 쌓고 백그라운드 워커가 묶어서 기록
+    # 예측이 리포트를 참조하므로 리포트를 먼저 기록
+    # 포인트는 지급 건마다 award_points RPC (원장 기록 + 합계 증가가 서버에서 원자적), ref 로 재시도 중복 방지
+    # 일시 오류는 큐 앞쪽으로 되돌려 지수 백오프로 재시도, 종료 시 atexit 로 마지막 flush
+    # 행마다 클라이언트 키 (리포트 id · 예측 ref) 로 중복 무시 upsert → 커밋 후 응답만 놓친 재시도도 한 번만 기록
+    # 영구 오류가 난 배치는 한 행씩 다시 기록하고, 그래도 실패한 행만 dead-letter 로 빼서 나머지는 계속 흐르게 함
+    def __init__(self, interval=1.0, batch_size=500):
+        self.interval, self.batch_size = interval, batch_size
+        self._lock, self._flush_lock = threading.Lock(), threading.Lock()
+        self._wake = threading.Event()
+        self._reports = []
+        self._predictions = []
+        self._awards = []          # award_points RPC 인자
+        self.dead = deque(maxlen=DEAD_LETTER_MAX)
+        self.written = self.failures = 0
+        threading.Thread(target=self._run, name="write-behind", daemon=True).start()
+        atexit.register(self.flush)
+
+    def add_report(self, row):
+        with self._lock: self._reports.append(row)
+        self._wake.set()
+
+    def add_prediction(self, row):
+        with self._lock: self._predictions.append(row)
+        self._wake.set()
+
+    def add_award(self, award):
+        with self._lock: self._awards.append(award)
+        self._wake.set()
+
+    def pending(self):
+        with self._lock: return len(self._reports) + len(self._predictions) + len(self._awards)
+
+    def _run(self):
+        delay = self.interval
+        while True:
+            self._wake.wait(delay)
+            self._wake.clear()
+            time.sleep(self.interval)   # 잠깐 모아서 한 번에 기록
+            delay = self.interval if self.flush() else min(delay * 2, 60)
+
+    def _dead_letter(self, target, row, e):
+        self.dead.append({"at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "target": target,
+                          "code": getattr(e, "code", None), "error": str(getattr(e, "message", None) or e)[:200],
+                          "row": json.dumps(row, default=str)[:500]})
+
+    def _insert(self, table, rows, key):
+        # 기록 못 한 행 중 다시 시도할 행(일시 오류)과 dead-letter 로 뺀 행을 반환
+        retry, dead = [], []
+        for i in range(0, len(rows), self.batch_size):
+            chunk = rows[i:i + self.batch_size]
+            try:
+                supabase_service.table(table).upsert(chunk, on_conflict=key, ignore_duplicates=True).execute()
+                self.written += len(chunk)
+                continue
+            except Exception as e:
+                self.failures += 1
+                if is_transient_db_error(e): return retry + rows[i:], dead
+            for row in chunk:
+                try:
+                    supabase_service.table(table).upsert(row, on_conflict=key, ignore_duplicates=True).execute()
+                    self.written += 1
+                except Exception as e:
+                    self.failures += 1
+                    if is_transient_db_error(e): retry.append(row)
+                    else:
+                        self._dead_letter(table, row, e)
+                        dead.append(row)
+        return retry, dead
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                reports, self._reports = self._reports, []
+                preds, self._predictions = self._predictions, []
+                awards, self._awards = self._awards, []
+            if not reports and not preds and not awards: return True
+            t0 = time.perf_counter()
+            report_retry, report_dead = self._insert('reports', reports, 'id')
+            # 리포트가 아직 안 들어간 예측은 함께 대기, 리포트가 dead-letter 면 참조 없이 기록
+            waiting = {r['id'] for r in report_retry}
+            lost = {r['id'] for r in report_dead}
+            held = [p for p in preds if p.get('report_id') in waiting]
+            preds = [p if p.get('report_id') not in lost else {**p, "report_id": None}
+                     for p in preds if p.get('report_id') not in waiting]
+            pred_retry, _ = self._insert('predictions', preds, 'ref')
+            award_retry = []
+            for award in awards:
+                if award_retry:
+                    award_retry.append(award)
+                    continue
+                try:
+                    supabase_service.rpc('award_points', award).execute()
+                    self.written += 1
+                except Exception as e:
+                    self.failures += 1
+                    if is_transient_db_error(e): award_retry.append(award)
+                    else: self._dead_letter('award_points', award, e)
+            with self._lock:
+                self._reports[:0] = report_retry
+                self._predictions[:0] = held + pred_retry
+                self._awards[:0] = award_retry
+            ok = not (report_retry or pred_retry or award_retry)
+            telemetry.record("supabase.write_behind", (time.perf_counter() - t0) * 1000, ok)
+            return ok
+
+@st.cache_resource
+def get_write_queue():
+    return WriteBehind()
+
+write_queue = get_write_queue()
+
+def save_prediction(user_id, ticker, price, verdict, report_id=None):
     target = (datetime.now() + timedelta(days=90)).date()
-    supabase.table('predictions').insert({
-        "user_id": user_id, "ticker": ticker, "price": price,
-        "verdict": verdict, "target_date": str(target)
-    }).execute()
+    write_queue.add_prediction({
+        "ref": str(uuid.uuid4()), "user_id": user_id, "ticker": ticker, "price": price,
+        "verdict": verdict, "target_date": str(target), "report_id": report_id
+    })
+
+def compress_report(text):
+    return base64.b64encode(zlib.compress(text.encode(), 9)).decode()
+
+def decompress_report(body_z):
+    return zlib.decompress(base64.b64decode(body_z)).decode()
+
+def save_report(user_id, ticker, verdict, tier, text, snapshot):
+    # 본문은 압축해서 기록, 예측 행이 참조할 id 를 반환
+    report_id = str(uuid.uuid4())
+    write_queue.add_report({
+        "id": report_id, "user_id": user_id, "ticker": ticker, "verdict": verdict, "tier": tier,
+        "model": REPORT_MODELS[tier], "snapshot": json.loads(json.dumps(snapshot, default=str)),
+        "body_z": compress_report(text)
+    })
+    return report_id
+
+def award_points(user_id, delta, reason, ref=None):
+    # 화면은 세션 상태로 즉시 반영, DB 반영은 write-behind 큐 → award_points RPC
+    # ref 는 지급 건 고유 키 (같은 ref 는 서버에서 한 번만 반영)
+    st.session_state["profile"]["points"] = st.session_state["profile"].get("points", 0) + delta
+    write_queue.add_award({"p_user_id": user_id, "p_delta": delta, "p_reason": reason,
+                           "p_ref": ref or str(uuid.uuid4())})
+
+@timed("supabase.count")
+def count_rows(table):
+    # 행을 내려받지 않고 서버에서 exact count 만 받음 (HEAD)
+    return supabase.table(table).select("id", count="exact", head=True).execute().count or 0
+
+PROFILE_COLUMNS = "id,email,nickname,subscription_type,points,is_onboarded,referral_code,referred_by"
+USER_PAGE_SIZE  = 50
+
+@timed("supabase.user_page")
+def fetch_user_page(after_id=None, search="", page_size=USER_PAGE_SIZE):
+    # id 기준 keyset 페이지: 한 페이지 + 1행만 조회해서 다음 페이지 유무 판단
+    q = supabase.table('profiles').select(PROFILE_COLUMNS).order('id').limit(page_size + 1)
+    if after_id: q = q.gt('id', after_id)
+    term = re.sub(r"[^\w@.\-]", "", search or "")
+    if term: q = q.or_(f"email.ilike.*{term}*,nickname.ilike.*{term}*")
+    rows = q.execute().data or []
+    return rows[:page_size], len(rows) > page_size
+
+REPORT_PAGE_SIZE = 20
+REPORT_LIST_COLUMNS = "id,ticker,verdict,tier,model,created_at"
+
+@timed("supabase.report_page")
+def fetch_report_page(user_id, before=None, page_size=REPORT_PAGE_SIZE):
+    # (created_at, id) 내림차순 keyset 페이지 (본문 제외). 한 페이지 + 1행으로 다음 페이지 유무 판단
+    # 같은 flush 배치의 리포트는 created_at 이 같으므로 id 로 경계를 나눔 — before 는 (created_at, id)
+    # 공용 클라이언트의 auth 는 마지막 로그인 사용자 → service 클라이언트로 읽고 user_id 로 직접 거름
+    q = (supabase_service.table('reports').select(REPORT_LIST_COLUMNS).eq('user_id', user_id)
+         .order('created_at', desc=True).order('id', desc=True).limit(page_size + 1))
+    if before:
+        at, rid = before
+        q = q.or_(f"created_at.lt.{at},and(created_at.eq.{at},id.lt.{rid})")
+    rows = q.execute().data or []
+    return rows[:page_size], len(rows) > page_size
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def fetch_report_body(report_id, user_id):
+    # 리포트는 수정되지 않으므로 펼친 본문은 캐시
+    with telemetry.span("supabase.report_body"):
+        rows = supabase_service.table('reports').select("body_z,snapshot").eq('id', report_id).eq('user_id', user_id).execute().data
+    if not rows: return None, None
+    return decompress_report(rows[0]['body_z']), rows[0]['snapshot']
+
+NOTICE_PAGE_SIZE = 20
+
+class AnnouncementStore:
+    # 공지 목록을 프로세스 메모리에 보관 (created_at 내림차순)
+    # PUBLISH / DELETE 는 DB 반영과 동시에 메모리도 갱신 → 독자는 DB 조회 없음
+    # DB 를 직접 수정한 경우를 대비해 ttl 이 지나면 다시 로드
+    def __init__(self, page_size=NOTICE_PAGE_SIZE, ttl=3600):
+        self.page_size, self.ttl = page_size, ttl
+        self._lock = threading.Lock()
+        self._items, self._exhausted, self._loaded_at = None, False, 0.0
+
+    @timed("supabase.announcements")
+    def _fetch(self, before=None):
+        q = supabase.table('announcements').select("*").order('created_at', desc=True).limit(self.page_size)
+        if before: q = q.lt('created_at', before)
+        return q.execute().data or []
+
+    def list(self, limit):
+        # 최신 limit 개와 더 오래된 공지가 남아있는지 여부를 반환
+        with self._lock:
+            if self._items is None or time.time() - self._loaded_at > self.ttl:
+                self._items = self._fetch()
+                self._exhausted = len(self._items) < self.page_size
+                self._loaded_at = time.time()
+            while len(self._items) < limit and not self._exhausted:
+                older = self._fetch(self._items[-1]['created_at'])
+                self._items.extend(older)
+                self._exhausted = len(older) < self.page_size
+            return self._items[:limit], len(self._items) > limit or not self._exhausted
+
+    def publish(self, content):
+        rows = supabase.table('announcements').insert({"content": content}).execute().data
+        with self._lock:
+            if self._items is not None and rows: self._items.insert(0, rows[0])
+
+    def delete(self, notice_id):
+        supabase.table('announcements').delete().eq('id', notice_id).execute()
+        with self._lock:
+            if self._items is not None: self._items = [n for n in self._items if n['id'] != notice_id]
+
+@st.cache_resource
+def get_announcements():
+    return AnnouncementStore()
+
+LEADERBOARD_SIZE = 100
+RANK_PAGE_SIZE = 10
+
+class LeaderboardSnapshot:
+    # 상위 top_n 명만 점수순으로 읽어 스냅샷 + user_id → (순위, 점수) 색인을 만들고 모든 세션이 공유
+    # 순위는 동점 공동 순위 (1, 2, 2, 4 ...). ttl 이 지나면 기존 스냅샷을 쓰면서 뒤에서 다시 만듦
+    # 상위권 밖 사용자는 "나보다 점수가 높은 인원" 을 서버에서 count (HEAD) 하고, 같은 점수는 스냅샷 동안 재사용
+    def __init__(self, ttl=60, top_n=LEADERBOARD_SIZE):
+        self.ttl, self.top_n = ttl, top_n
+        self._snap = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    @timed("supabase.leaderboard")
+    def _load(self):
+        # profiles (points desc, id) 인덱스로 상위 top_n 만 조회, 이메일은 읽지 않음
+        rows = (supabase.table('profiles').select("id,nickname,points,subscription_type")
+                .order('points', desc=True).order('id').limit(self.top_n).execute().data or [])
+        df = pd.DataFrame(rows, columns=["id", "nickname", "points", "subscription_type"])
+        df['points'] = pd.to_numeric(df['points']).fillna(0).astype('int64')
+        df['rank'] = df['points'].rank(method='min', ascending=False).astype('int64')
+        return {"top": df.to_dict('records'),
+                "rank_of": dict(zip(df['id'], zip(df['rank'].tolist(), df['points'].tolist()))),
+                "above": {},        # 점수 → 그보다 높은 인원 (상위권 밖 조회 결과)
+                "total": count_rows('profiles'), "built_at": time.time()}
+
+    def _refresh(self):
+        try: snap = self._load()
+        except Exception: snap = None
+        with self._lock:
+            if snap is not None: self._snap = snap
+            self._refreshing = False
+
+    def snapshot(self):
+        with self._lock:
+            snap = self._snap
+            stale = snap is not None and time.time() - snap["built_at"] > self.ttl and not self._refreshing
+            if stale: self._refreshing = True
+        if stale:
+            threading.Thread(target=self._refresh, name="leaderboard", daemon=True).start()
+        if snap is None:
+            with self._load_lock:
+                if self._snap is None: self._snap = self._load()
+                snap = self._snap
+        return snap
+
+    def page(self, offset, limit=RANK_PAGE_SIZE):
+        snap = self.snapshot()
+        return snap["top"][offset:offset + limit], len(snap["top"])
+
+    def lookup(self, user_id, points=0):
+        # 순위 · 전체 인원 · 상위 %. 상위권이면 DB 조회 없음
+        snap = self.snapshot()
+        hit = snap["rank_of"].get(user_id)
+        if hit: rank, points = hit
+        else:
+            points = points or 0
+            if points not in snap["above"]:
+                with telemetry.span("supabase.rank"):
+                    snap["above"][points] = (supabase.table('profiles').select("id", count="exact", head=True)
+                                             .gt('points', points).execute().count or 0)
+            rank = snap["above"][points] + 1
+        total = max(snap["total"], rank)
+        return {"rank": rank, "points": points, "total": total, "top_pct": rank / total * 100,
+                "as_of": snap["built_at"]}
+
+@st.cache_resource
+def get_leaderboard():
+    return LeaderboardSnapshot(ttl=int(st.secrets.get("LEADERBOARD_TTL", 60)))
 
 # ---------------------------------------------------------
 # 4. AI 퀀트 엔진
 # ---------------------------------------------------------
-@st.cache_data(ttl=600)
-def fetch_fmp(endpoint, params=""):
-    url = f"https://financialmodelingprep.com/stable/{endpoint}?{params}&apikey={FMP_API_KEY}"
-    try:
-        req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-        with urllib.request.urlopen(req, context=ssl_context, timeout=15) as r:
-            return json.loads(r.read().decode('utf-8'))
-    except: return None
+class SingleFlight:
+    # 같은 키의 요청이 진행 중이면 upstream 을 다시 부르지 않고 그 결과를 함께 받음
+    def __init__(self, history=200):
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.flights = self.absorbed = self.max_absorbed = 0
+        self.recent = deque(maxlen=history)   # (key, 합류한 호출 수)
+
+    def do(self, key, fn):
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = {"done": threading.Event(), "callers": 1, "result": None, "error": None}
+                self.flights += 1
+            else:
+                flight["callers"] += 1
+                self.absorbed += 1
+        if not leader:
+            flight["done"].wait()
+        else:
+            try: flight["result"] = fn()
+            except Exception as e: flight["error"] = e
+            finally:
+                with self._lock:
+                    del self._inflight[key]
+                    self.recent.append((key, flight["callers"] - 1))
+                    self.max_absorbed = max(self.max_absorbed, flight["callers"] - 1)
+                flight["done"].set()
+        if flight["error"]: raise flight["error"]
+        return flight["result"]
+
+    def stats(self):
+        with self._lock:
+            return {"flights": self.flights, "absorbed": self.absorbed, "max_absorbed": self.max_absorbed,
+                    "inflight": len(self._inflight)}
+
+@st.cache_resource
+def get_fmp_flights():
+    return SingleFlight()
+
+fmp_flights = get_fmp_flights()
+
+def _fmp_get(endpoint, params="", timeout=None):
+    # 캐시 없는 원본 호출 (백그라운드 스레드에서도 사용). 동일 URL 동시 요청은 1회로 합침
+    # 데이터 없음은 [] (404 포함), 호출 실패는 UpstreamError
+    url = f"{FMP_BASE_URL}/{endpoint}?{params}&apikey={FMP_API_KEY}"
+    def call():
+        t0, ok = time.perf_counter(), False
+        try:
+            r = http.request("GET", url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=timeout)
+            if r.status == 404:
+                ok = True
+                return []
+            if r.status >= 400: raise UpstreamError(urllib3.util.parse_url(url).host, f"http_{r.status}", r.status)
+            try: data = json.loads(r.data.decode('utf-8'))
+            except ValueError: raise UpstreamError(urllib3.util.parse_url(url).host, "bad_response", r.status)
+            ok = True
+            return data
+        finally: telemetry.record(f"fmp.{endpoint}", (time.perf_counter() - t0) * 1000, ok)
+    return fmp_flights.do((endpoint, params), call)
+
+# OpenAI 호출 승인 제어: 전역 동시 실행 상한 + 분당 토큰 예산 + 사용자별 공정 대기열
+OPENAI_MAX_CONCURRENCY = int(st.secrets.get("OPENAI_MAX_CONCURRENCY", 4))
+OPENAI_PER_USER = int(st.secrets.get("OPENAI_PER_USER", 2))
+OPENAI_TPM = int(st.secrets.get("OPENAI_TPM", 90000))
+OPENAI_MAX_QUEUE = int(st.secrets.get("OPENAI_MAX_QUEUE", 100))
+OPENAI_COMPLETION_TOKENS = 1500   # 응답 토큰 예상치 (예산 예약용)
+
+class AdmissionTicket:
+    def __init__(self, user_id, premium, tokens, fn, seq):
+        self.user_id, self.premium, self.tokens, self.fn, self.seq = user_id, premium, tokens, fn, seq
+        self.state = "queued"
+        self.future = Future()
+
+class AdmissionController:
+    # 대기 순서: premium 먼저, 같은 등급 안에서는 가장 오래 전에 처리된 사용자부터 한 건씩 (round-robin)
+    def __init__(self, max_concurrency, per_user, tpm, max_queue):
+        self.max_concurrency, self.per_user, self.tpm, self.max_queue = max_concurrency, per_user, tpm, max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="openai")
+        self._queues = {}          # user_id -> deque[AdmissionTicket]
+        self._running = {}         # user_id -> 실행 중 건수
+        self._served = {}          # user_id -> 마지막 승인 순번
+        self._window = deque()     # (ts, tokens) 최근 60초 예약분
+        self._seq = 0
+        self._timer = None
+        self._lock = threading.Lock()
+        self.admitted = self.rejected = 0
+
+    def submit(self, user_id, premium, tokens, fn):
+        # 대기열이 가득 차면 None
+        with self._lock:
+            if sum(len(q) for q in self._queues.values()) >= self.max_queue:
+                self.rejected += 1
+                return None
+            self._seq += 1
+            ticket = AdmissionTicket(user_id, premium, tokens, fn, self._seq)
+            self._queues.setdefault(user_id, deque()).append(ticket)
+            self._dispatch()
+        return ticket
+
+    def position(self, ticket):
+        # 1 부터 시작하는 대기 순번, 이미 실행 중이거나 끝났으면 0
+        with self._lock:
+            if ticket.state != "queued": return 0
+            return self._order().index(ticket) + 1
+
+    def _order(self):
+        order = []
+        for premium in (True, False):
+            users = sorted((u for u, q in self._queues.items() if q[0].premium == premium),
+                           key=lambda u: (self._served.get(u, 0), self._queues[u][0].seq))
+            lanes = [self._queues[u] for u in users]
+            for i in range(max(map(len, lanes), default=0)):
+                order += [lane[i] for lane in lanes if i < len(lane)]
+        return order
+
+    def _tokens_used(self, now):
+        while self._window and now - self._window[0][0] >= 60: self._window.popleft()
+        return sum(t for _, t in self._window)
+
+    def _dispatch(self):
+        # self._lock 을 잡은 상태에서만 호출
+        now = time.time()
+        while sum(self._running.values()) < self.max_concurrency:
+            ticket = next((t for t in self._order() if self._running.get(t.user_id, 0) < self.per_user), None)
+            if ticket is None: return
+            if self._tokens_used(now) and self._tokens_used(now) + ticket.tokens > self.tpm:
+                # 예산이 가장 먼저 풀리는 시점에 다시 시도
+                if self._timer is None:
+                    self._timer = threading.Timer(60.05 - (now - self._window[0][0]), self._wake)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+            queue = self._queues[ticket.user_id]
+            queue.remove(ticket)
+            if not queue: del self._queues[ticket.user_id]
+            self._seq += 1
+            self._served[ticket.user_id] = self._seq
+            self._running[ticket.user_id] = self._running.get(ticket.user_id, 0) + 1
+            self._window.append((now, ticket.tokens))
+            ticket.state = "running"
+            self.admitted += 1
+            self._pool.submit(self._run, ticket)
+
+    def _wake(self):
+        with self._lock:
+            self._timer = None
+            self._dispatch()
+
+    def _run(self, ticket):
+        try: ticket.future.set_result(ticket.fn())
+        except Exception as e: ticket.future.set_exception(e)
+        finally:
+            with self._lock:
+                ticket.state = "done"
+                self._running[ticket.user_id] -= 1
+                if not self._running[ticket.user_id]:
+                    del self._running[ticket.user_id]
+                    if ticket.user_id not in self._queues: self._served.pop(ticket.user_id, None)
+                self._dispatch()
+
+    def stats(self):
+        with self._lock:
+            return {"running": sum(self._running.values()), "queued": sum(len(q) for q in self._queues.values()),
+                    "tokens_1m": self._tokens_used(time.time()), "admitted": self.admitted, "rejected": self.rejected}
+
+@st.cache_resource
+def get_admission():
+    return AdmissionController(OPENAI_MAX_CONCURRENCY, OPENAI_PER_USER, OPENAI_TPM, OPENAI_MAX_QUEUE)
 
-def generate_ai_report(ticker, s, user_tier="free"):
-    url = "https://api.openai.com/v1/chat/completions"
+admission = get_admission()
+
+def estimate_tokens(body):
+    return len(body) // 4 + OPENAI_COMPLETION_TOKENS
+
+REPORT_FAILED = "분석 로딩 실패. [VERDICT: HOLD]"
+
+REPORT_MODELS = {"premium": "gpt-4o", "free": "gpt-4o-mini"}
+
+def _report_request(ticker, s, user_tier, stream=False, context=None):
+    url = f"{OPENAI_BASE_URL}/chat/completions"
     headers = {"Content-Type": "application/json", "Authorization": f"Bearer {OPENAI_API_KEY}"}
-    ai_model = "gpt-4o" if user_tier == "premium" else "gpt-4o-mini"
+    ai_model = REPORT_MODELS.get(user_tier, REPORT_MODELS["free"])
+    ctx = context or {}
+    section = lambda *keys: json.dumps({k: ctx[k] for k in keys if ctx.get(k)}) if any(ctx.get(k) for k in keys) else "N/A"
     prompt = f"""
     [ROLE]: Lead Institutional Quant Analyst.
     [TASK]: 90-DAY Premium Research Report for {ticker}.
@@ -606,16 +1317,744 @@ def generate_ai_report(ticker, s, user_tier="free"):
     4. Analyst Consensus (15%): Institutional buy/sell ratios.
     5. Market Psychology (10%): News sentiment, social hype.
     [DATA]: {json.dumps(s)}
+    [TECHNICALS]: {section("technicals")}
+    [FUNDAMENTALS]: {section("profile", "ratios")}
+    [ANALYST CONSENSUS]: {section("estimates", "grades")}
+    [NEWS]: {section("news")}
     [FORMAT]: KOREAN Markdown. 
     [STRUCTURE]: 1.예측승률 2.가중치분석요약 3.핵심정책이슈 4.월가동향 5.최종결론
     리포트 끝에 반드시 [VERDICT: BUY/SELL/HOLD] 포함.
     """
     payload = {"model": ai_model, "messages": [{"role": "system", "content": "Financial Expert."}, {"role": "user", "content": prompt}]}
+    if stream: payload["stream"] = True
+    return url, json.dumps(payload).encode('utf-8'), headers
+
+def stream_ai_report(ticker, s, user_tier="free", context=None):
+    # chat-completions SSE 스트림의 content 조각을 도착 순서대로 반환
+    # [DONE] 전에 끊기거나 호출이 실패하면 UpstreamError
+    url, body, headers = _report_request(ticker, s, user_tier, stream=True, context=context)
+    host = urllib3.util.parse_url(url).host
+    got, ok = False, False
+    r, t0 = None, time.perf_counter()
     try:
-        req = urllib.request.Request(url, data=json.dumps(payload).encode('utf-8'), headers=headers)
-        with urllib.request.urlopen(req, context=ssl_context) as r:
-            return json.loads(r.read().decode('utf-8'))['choices'][0]['message']['content']
-    except: return "분석 로딩 실패. [VERDICT: HOLD]"
+        r = http.request("POST", url, body=body, headers=headers, stream=True)
+        if r.status >= 400: raise UpstreamError(host, f"http_{r.status}", r.status)
+        try:
+            for raw in r:
+                line = raw.decode('utf-8').strip()
+                if not line.startswith("data:"): continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    ok = True
+                    return
+                # data / choices / delta 가 객체가 아니면 (예: "delta": null) 형식 오류
+                event = json.loads(data)
+                choices = (event.get("choices") or []) if isinstance(event, dict) else None
+                if not isinstance(choices, list) or (choices and not isinstance(choices[0], dict)):
+                    raise UpstreamError(host, "bad_response")
+                delta = choices[0].get("delta", {}) if choices else {}
+                if not isinstance(delta, dict):
+                    raise UpstreamError(host, "bad_response")
+                delta = delta.get("content")
+                if delta:
+                    if not got: telemetry.record("openai.ttft", (time.perf_counter() - t0) * 1000)
+                    got = True
+                    yield delta
+        except (urllib3.exceptions.HTTPError, ValueError) as e:
+            raise UpstreamError(host, "stream_interrupted") from e
+        raise UpstreamError(host, "stream_interrupted")
+    finally:
+        # 남은 바이트를 비우고 커넥션을 풀로 반납 (keep-alive 유지)
+        if r is not None:
+            r.drain_conn()
+            r.release_conn()
+        telemetry.record("openai.stream", (time.perf_counter() - t0) * 1000, ok)
+
+def parse_verdict(report):
+    return report.split("[VERDICT:")[1].split("]")[0].strip() if "[VERDICT:" in report else "HOLD"
+
+def render_report_html(ticker, tier, report, v=None, now_str="", queued=0):
+    # v 가 None 이면 스트리밍 중 상태로 렌더 (queued > 0 이면 대기 순번 표시)
+    if v is None and queued:
+        badge = f"<span class='verdict-hold'>⧗ QUEUED · #{queued}</span>"
+    elif v is None:
+        badge = "<span class='verdict-hold'>▌ STREAMING</span>"
+    else:
+        v_class = {"BUY": "verdict-buy", "SELL": "verdict-sell"}.get(v, "verdict-hold")
+        v_icon  = {"BUY": "▲", "SELL": "▼"}.get(v, "—")
+        badge = f"<span class='{v_class}'>{v_icon} {v}</span>"
+    return f"""
+    <div class='report-wrapper'>
+        <div class='report-header'>
+            <span class='report-header-title'>TETRADES QUANT REPORT · {ticker}</span>
+            <span>{now_str} KST · {tier.upper()} TIER</span>
+        </div>
+        <div class='report-body'>{report or "ANALYZING MARKET DATA..."}</div>
+        <div class='report-footer'>
+            {badge}
+            &nbsp;&nbsp;
+            ⚠ 본 리포트는 AI 생성 참고용 정보이며 투자 권유가 아닙니다. 투자 결과에 대한 책임은 투자자 본인에게 있습니다.
+        </div>
+    </div>
+    """
+
+# ---------------------------------------------------------
+# 4-1. 리포트 캐시 (전체 세션 공유)
+# ---------------------------------------------------------
+class ReportCache:
+    # (ticker, tier, 시세 구간) -> 리포트. TTL 만료 + LRU 축출
+    def __init__(self, maxsize=256, ttl=3600):
+        self.maxsize, self.ttl = maxsize, ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item and time.time() - item[0] < self.ttl:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item: del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, report):
+        with self._lock:
+            self._data[key] = (time.time(), report)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {"size": len(self._data), "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions, "hit_rate": self.hits / total if total else 0.0}
+
+@st.cache_resource
+def get_report_cache():
+    return ReportCache(maxsize=int(st.secrets.get("REPORT_CACHE_SIZE", 256)),
+                       ttl=int(st.secrets.get("REPORT_CACHE_TTL", 3600)))
+
+def report_cache_key(ticker, tier, s):
+    # 같은 거래일, 가격 1% 구간 안의 시세는 같은 리포트를 공유
+    price = s.get('price') or 0
+    bucket = round(math.log(price) / math.log(1.01)) if price > 0 else 0
+    day = datetime.now(pytz.timezone('America/New_York')).date()
+    return (ticker, tier, str(day), bucket)
+
+# ---------------------------------------------------------
+# 4-2. 보강 데이터 (FMP 다중 엔드포인트 병렬 조회)
+# ---------------------------------------------------------
+# 이름: (endpoint, params, timeout 초, 남길 필드 — None 이면 숫자 필드만)
+ENRICH_ENDPOINTS = {
+    "profile":   ("profile",           "symbol={t}",                        4, ["companyName", "sector", "industry", "country", "beta"]),
+    "ratios":    ("ratios-ttm",        "symbol={t}",                        5, None),
+    "estimates": ("analyst-estimates", "symbol={t}&period=annual&limit=2",  5, None),
+    "grades":    ("grades-consensus",  "symbol={t}",                        4, None),
+    "news":      ("news/stock",        "symbols={t}&limit=5",               5, ["publishedDate", "title", "site"]),
+}
+
+def _compact(rows, keys=None, limit=5):
+    # 프롬프트에 넣기 좋게 필요한 필드만 남기고 숫자는 반올림
+    rows = rows if isinstance(rows, list) else [rows]
+    out = []
+    for r in rows[:limit]:
+        if not isinstance(r, dict): continue
+        if keys: c = {k: r[k] for k in keys if r.get(k) is not None}
+        else: c = {k: round(v, 4) if isinstance(v, float) else v for k, v in r.items()
+                   if k in ("date", "period") or (isinstance(v, (int, float)) and not isinstance(v, bool))}
+        if c: out.append(c)
+    return out
+
+@st.cache_resource
+def get_enrich_pool():
+    return ThreadPoolExecutor(max_workers=16, thread_name_prefix="enrich")
+
+@st.cache_resource
+def get_enrich_cache():
+    # 티커별 보강 데이터는 30분 동안 재사용 (ReportCache 의 TTL+LRU 를 그대로 사용)
+    return ReportCache(maxsize=512, ttl=1800)
+
+enrich_pool, enrich_cache = get_enrich_pool(), get_enrich_cache()
+
+def fetch_enrichment(ticker):
+    # 모든 엔드포인트를 동시에 호출 → 소요 시간 ≈ 가장 느린 엔드포인트 1개
+    # 엔드포인트별 타임아웃, 실패/지연된 항목은 빼고 나머지만 반환
+    cached = enrich_cache.get(ticker)
+    if cached is not None: return cached
+    futures = {enrich_pool.submit(_fmp_get, ep, params.format(t=ticker), timeout): (name, keys)
+               for name, (ep, params, timeout, keys) in ENRICH_ENDPOINTS.items()}
+    done, _ = wait(futures, timeout=max(v[2] for v in ENRICH_ENDPOINTS.values()) + 1)
+    result = {}
+    for f in done:
+        if f.exception() is not None: continue
+        name, keys = futures[f]
+        rows = _compact(f.result() or [], keys)
+        if rows: result[name] = rows
+    if result: enrich_cache.put(ticker, result)
+    return result
+
+# ---------------------------------------------------------
+# 4-3. 백그라운드 리포트 생성
+# ---------------------------------------------------------
+AD_SECONDS = float(st.secrets.get("AD_SECONDS", 5))
+REPORT_JOB_RETENTION = int(st.secrets.get("REPORT_JOB_RETENTION", 1800))   # 끝난 작업 보관 (초)
+REPORT_POLL_SEC = float(st.secrets.get("REPORT_POLL_SEC", 0.5))
+
+class ReportJob:
+    # 워커 스레드가 스트림 조각을 누적, UI 스레드는 text / done / position() 을 폴링
+    # 완료되면 워커가 직접 캐시에 넣으므로 화면이 끊겨도 결과는 남음
+    def __init__(self, ticker, s, tier, cache, cache_key, context=None, user_id=None):
+        self.id = uuid.uuid4().hex
+        self.ticker, self.s, self.tier, self.context = ticker, s, tier, context or {}
+        self.cache, self.cache_key, self.user_id = cache, cache_key, user_id
+        self.chunks = []
+        self.ticket = None
+        self.error = None
+        self.finished_at = None
+        self.done = threading.Event()
+
+    @property
+    def text(self):
+        return "".join(self.chunks)
+
+    @property
+    def failed(self):
+        return self.done.is_set() and self.error is not None
+
+    def position(self):
+        return admission.position(self.ticket) if self.ticket else 0
+
+    def run(self):
+        # 보강 데이터를 모은 뒤 OpenAI 호출은 승인 대기열로 넘김
+        # 기술적 지표(일봉 조회)도 엔드포인트 호출과 함께 enrich_pool 에 띄움 → 소요 시간 ≈ 둘 중 느린 쪽
+        try:
+            tech = None if "technicals" in self.context else enrich_pool.submit(fetch_technicals, self.ticker)
+            context = {**self.context, **fetch_enrichment(self.ticker)}
+            if tech is not None:
+                context["technicals"] = tech.result()
+            body = _report_request(self.ticker, self.s, self.tier, stream=True, context=context)[1]
+            self.ticket = admission.submit(self.user_id, self.tier == "premium", estimate_tokens(body),
+                                           lambda: self._generate(context))
+            if self.ticket is None: self.error = UpstreamError("openai", "queue_full")
+        finally:
+            if self.ticket is None:
+                self.error = self.error or UpstreamError("report", "internal")
+                self.chunks.append(REPORT_FAILED)
+                self._finish()
+
+    def _generate(self, context):
+        try:
+            for chunk in stream_ai_report(self.ticker, self.s, self.tier, context):
+                self.chunks.append(chunk)
+            self.cache.put(self.cache_key, self.text)
+        except UpstreamError as e:
+            self.error = e
+            self.chunks.append(("\n\n" if self.chunks else "") + REPORT_FAILED)
+        except Exception:
+            # 그 외 예외도 실패로 기록 → 부분 본문을 완료로 보고 저장 · 포인트 지급하지 않도록
+            self.error = UpstreamError("report", "internal")
+            self.chunks.append(("\n\n" if self.chunks else "") + REPORT_FAILED)
+        finally:
+            self._finish()
+
+    def _finish(self):
+        self.finished_at = time.time()
+        self.done.set()
+
+class ReportJobStore:
+    # job_id -> ReportJob. 세션에는 id 만 두므로 재실행 · 탭 이동 뒤에도 같은 작업을 다시 찾아 보여줌
+    # 끝난 작업은 retention 초 뒤 정리 (본문은 리포트 캐시에도 남음)
+    def __init__(self, pool, retention):
+        self.pool, self.retention = pool, retention
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, job):
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self.pool.submit(job.run)
+        return job
+
+    def get(self, job_id, user_id):
+        # 다른 사용자의 작업은 보이지 않음
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(job_id)
+        return job if job is not None and job.user_id == user_id else None
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        for k in [k for k, j in self._jobs.items() if j.finished_at and j.finished_at < cutoff]:
+            del self._jobs[k]
+
+    def stats(self):
+        with self._lock:
+            running = sum(not j.done.is_set() for j in self._jobs.values())
+            return {"running": running, "retained": len(self._jobs) - running}
+
+@st.cache_resource
+def get_report_pool():
+    return ThreadPoolExecutor(max_workers=int(st.secrets.get("REPORT_WORKERS", 8)), thread_name_prefix="report")
+
+@st.cache_resource
+def get_report_jobs():
+    return ReportJobStore(get_report_pool(), REPORT_JOB_RETENTION)
+
+report_jobs = get_report_jobs()
+
+def start_report_job(ticker, s, tier, cache, cache_key, context=None, user_id=None):
+    return report_jobs.submit(ReportJob(ticker, s, tier, cache, cache_key, context, user_id))
+
+# ---------------------------------------------------------
+# 4-4. 라이브 티커 테이프 (백그라운드 갱신)
+# ---------------------------------------------------------
+TAPE_SYMBOLS = [x.strip().upper() for x in str(st.secrets.get("TAPE_SYMBOLS", "SPY,NVDA,AAPL,TSLA,MSFT,AMZN,META,GOOGL,MU,AMD")).split(",") if x.strip()]
+TAPE_REFRESH_SEC = int(st.secrets.get("TAPE_REFRESH_SEC", 60))
+
+class QuoteTape:
+    # batch-quote 1회로 전 종목 갱신. 세션 렌더는 메모리 스냅샷만 읽음
+    def __init__(self, symbols, interval):
+        self.symbols, self.interval = symbols, interval
+        self.snapshot = {}
+        self.updated_at = None
+        threading.Thread(target=self._run, name="quote-tape", daemon=True).start()
+
+    def _run(self):
+        while True:
+            try: self.refresh()
+            except Exception: pass
+            # 장 마감 · 휴장 중에는 다음 세션 전까지 거의 호출하지 않음 (최대 1시간 간격)
+            time.sleep(max(self.interval, min(quote_ttl(), 3600)))
+
+    def refresh(self):
+        data = _fmp_get("batch-quote", f"symbols={','.join(self.symbols)}")
+        if data:
+            quote_cache.put_many(data)
+            # dict 를 통째로 교체 → 읽는 쪽은 락 없이 일관된 스냅샷을 봄
+            self.snapshot = {q['symbol']: q for q in data if q.get('symbol')}
+            self.updated_at = time.time()
+
+    def items(self):
+        snap = self.snapshot
+        for sym in self.symbols:
+            q = snap.get(sym)
+            if not q or q.get('price') is None:
+                yield sym, "—", "", "up"
+                continue
+            chg = q.get('changePercentage', q.get('changesPercentage')) or 0
+            yield sym, f"{q['price']:,.2f}", f"{chg:+.2f}%", "up" if chg >= 0 else "dn"
+
+@st.cache_resource
+def get_quote_tape():
+    return QuoteTape(TAPE_SYMBOLS, TAPE_REFRESH_SEC)
+
+# ---------------------------------------------------------
+# 4-5. 로컬 가격 히스토리 저장소 (Parquet)
+# ---------------------------------------------------------
+PRICE_STORE_DIR = st.secrets.get("PRICE_STORE_DIR", ".price_store")
+PRICE_HISTORY_DAYS = int(st.secrets.get("PRICE_HISTORY_DAYS", 400))    # start 없이 조회할 때의 기본 구간
+PRICE_FRAME_CACHE = int(st.secrets.get("PRICE_FRAME_CACHE", 256))       # 메모리에 올려둘 티커 수 (LRU)
+
+class PriceStore:
+    # 티커당 Parquet 파일 1개에 일봉 OHLCV 보관, date 오름차순
+    # update() 는 요청한 start 이전 구간이 비어 있으면 그 부분만 받고,
+    # 마지막 저장일 이후 봉은 거래일당 1번만 upstream 확인해서 이어붙임
+    COLUMNS = ["date", "open", "high", "low", "close", "volume"]
+
+    def __init__(self, root, history_days, max_frames=PRICE_FRAME_CACHE):
+        self.root, self.history_days, self.max_frames = root, history_days, max_frames
+        os.makedirs(root, exist_ok=True)
+        self._locks = defaultdict(threading.Lock)
+        self._frames = OrderedDict()   # ticker -> (mtime, DataFrame), LRU
+        self._frames_lock = threading.Lock()
+        self._checked = {}    # ticker -> 마지막으로 upstream 을 확인한 날짜
+        self._covered = {}    # ticker -> upstream 에 이미 요청한 가장 이른 날짜
+
+    def _path(self, ticker):
+        name = re.sub(r"[^A-Z0-9.\-]", "_", ticker.upper())
+        return os.path.join(self.root, f"{name}.parquet")
+
+    def load(self, ticker):
+        # memory_map + split_blocks: 숫자 컬럼은 복사 없이 Arrow 버퍼를 그대로 NumPy 로 노출
+        path = self._path(ticker)
+        if not os.path.exists(path):
+            return pd.DataFrame({c: pd.Series(dtype="datetime64[ns]" if c == "date" else "float64") for c in self.COLUMNS})
+        mtime = os.path.getmtime(path)
+        with self._frames_lock:
+            hit = self._frames.get(ticker)
+            if hit and hit[0] == mtime:
+                self._frames.move_to_end(ticker)
+                return hit[1]
+        df = pq.read_table(path, memory_map=True).to_pandas(split_blocks=True, self_destruct=True)
+        with self._frames_lock:
+            self._frames[ticker] = (mtime, df)
+            self._frames.move_to_end(ticker)
+            while len(self._frames) > self.max_frames: self._frames.popitem(last=False)
+        return df
+
+    def update(self, ticker, start=None):
+        today = datetime.now(pytz.timezone('America/New_York')).date()
+        start = start or today - timedelta(days=self.history_days)
+        with self._locks[ticker]:
+            df = self.load(ticker)
+            covered = self._covered.get(ticker) or (df['date'].iloc[0].date() if len(df) else None)
+            spans = []
+            if covered is None or start < covered:
+                spans.append((start, covered - timedelta(days=1) if covered else today))
+            if covered is not None and self._checked.get(ticker) != today:
+                # 꼬리는 마지막 저장일부터 다시 받음 → 장중에 받은 미완성 봉을 확정 종가로 덮어씀 (drop_duplicates keep='last')
+                spans.append((df['date'].iloc[-1].date() if len(df) else self._checked.get(ticker, start), today))
+            frames = []
+            for lo, hi in spans:
+                if lo > hi: continue
+                # 실패는 UpstreamError 로 올림 (호출한 쪽이 저장된 값으로 대체할지 결정, 다음 호출에서 재시도)
+                frames.append(pd.DataFrame(_fmp_get("historical-price-eod/full", f"symbol={ticker}&from={lo}&to={hi}")))
+            new = [f.reindex(columns=self.COLUMNS) for f in frames if len(f)]
+            if new:
+                new = pd.concat(new, ignore_index=True).assign(date=lambda d: pd.to_datetime(d['date']).astype('datetime64[ns]'))
+                df = (pd.concat([df, new.astype({c: "float64" for c in self.COLUMNS[1:]})], ignore_index=True)
+                      .drop_duplicates('date', keep='last').sort_values('date', ignore_index=True))
+                tmp = self._path(ticker) + ".tmp"
+                pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp)
+                os.replace(tmp, self._path(ticker))
+                df = self.load(ticker)
+            self._covered[ticker] = min(start, covered) if covered else start
+            self._checked[ticker] = today
+            return df
+
+    def range(self, ticker, start=None, end=None, update=True):
+        # date 가 정렬되어 있으므로 이진 탐색으로 구간만 잘라서 반환
+        if isinstance(start, str): start = date.fromisoformat(start)
+        df = self.update(ticker, start) if update else self.load(ticker)
+        dates = df['date'].values
+        lo = dates.searchsorted(np.datetime64(pd.Timestamp(start), 'ns'), 'left') if start else 0
+        hi = dates.searchsorted(np.datetime64(pd.Timestamp(end), 'ns'), 'right') if end else len(df)
+        return df.iloc[lo:hi]
+
+@st.cache_resource
+def get_price_store():
+    return PriceStore(PRICE_STORE_DIR, PRICE_HISTORY_DAYS)
+
+price_store = get_price_store()
+
+# ---------------------------------------------------------
+# 4-6. 기술적 지표 (일봉 기반, 벡터 연산)
+# ---------------------------------------------------------
+def compute_indicators(df):
+    # 일봉 DataFrame 전체를 한 번에 계산하고 마지막 값만 요약해서 반환
+    if len(df) < 30: return None
+    close, high, low = df['close'], df['high'], df['low']
+    prev = close.shift(1)
+    ema12, ema26 = close.ewm(span=12, adjust=False).mean(), close.ewm(span=26, adjust=False).mean()
+    macd = ema12 - ema26
+    signal = macd.ewm(span=9, adjust=False).mean()
+    delta = close.diff()
+    gain = delta.clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+    loss = (-delta.clip(upper=0)).ewm(alpha=1 / 14, adjust=False).mean()
+    rsi = 100 - 100 / (1 + gain / loss.replace(0, np.nan))
+    tr = pd.concat([high - low, (high - prev).abs(), (low - prev).abs()], axis=1).max(axis=1)
+    atr = tr.ewm(alpha=1 / 14, adjust=False).mean()
+    vol20 = np.log(close / prev).rolling(20).std() * np.sqrt(252)
+    last = float(close.iloc[-1])
+    def r(x, n=2):
+        x = float(x.iloc[-1]) if hasattr(x, 'iloc') else float(x)
+        return None if np.isnan(x) else round(x, n)
+    return {
+        "asof": str(df['date'].iloc[-1].date()), "close": round(last, 2),
+        "sma20": r(close.rolling(20).mean()), "sma50": r(close.rolling(50).mean()), "sma200": r(close.rolling(200).mean()),
+        "ema12": r(ema12), "ema26": r(ema26),
+        "rsi14": r(rsi, 1), "macd": r(macd, 3), "macd_signal": r(signal, 3), "macd_hist": r(macd - signal, 3),
+        "atr14": r(atr), "atr_pct": r(atr / close * 100), "vol20_ann_pct": r(vol20 * 100, 1),
+    }
+
+@st.cache_data(max_entries=1024, show_spinner=False)
+def get_indicators(ticker, trading_day):
+    # trading_day 가 캐시 키에 들어가므로 티커당 하루 1번만 계산
+    # 일봉 조회 실패는 UpstreamError 로 빠져나가므로 캐시되지 않음
+    return compute_indicators(price_store.range(ticker, end=trading_day))
+
+def fetch_technicals(ticker):
+    # 리포트 작업 · 백그라운드 스레드용. 실패하면 None (다음 호출에서 다시 계산)
+    try: return get_indicators(ticker, str(datetime.now(pytz.timezone('America/New_York')).date()))
+    except UpstreamError: return None
+
+# ---------------------------------------------------------
+# 4-7. 예측 채점 (배치)
+# ---------------------------------------------------------
+SCORE_HOLD_BAND = 0.05   # HOLD 은 수익률 ±5% 이내면 적중
+SCORE_PAGE_SIZE = 1000
+
+def fetch_matured_predictions():
+    # target_date 가 지났고 (당일 종가는 아직 없을 수 있으므로 오늘은 제외) 아직 채점되지 않은 예측을 id keyset 으로 전부 조회
+    # 모든 사용자의 행이 대상 → 공용 클라이언트(마지막 로그인 사용자 세션)가 아닌 service 클라이언트로
+    today = str(datetime.now(pytz.timezone('America/New_York')).date())
+    rows, last_id = [], None
+    while True:
+        q = (supabase_service.table('predictions').select("id,user_id,ticker,price,verdict,target_date")
+             .lt('target_date', today).is_('scored_at', 'null').order('id').limit(SCORE_PAGE_SIZE))
+        if last_id is not None: q = q.gt('id', last_id)
+        page = q.execute().data or []
+        rows += page
+        if len(page) < SCORE_PAGE_SIZE: return rows
+        last_id = page[-1]['id']
+
+def fetch_closes(ticker, start, end):
+    try: bars = price_store.range(ticker, start, end)
+    except UpstreamError: bars = price_store.range(ticker, start, end, update=False)   # 빠진 봉은 다음 채점에서
+    return pd.DataFrame({"ticker": ticker, "date": bars['date'].values, "close": bars['close'].values}).dropna()
+
+def score_predictions(preds, closes):
+    # 목표일 당일(휴장이면 직전 거래일, 최대 5일) 종가로 수익률·적중 여부를 한 번에 계산
+    preds = preds.assign(target_date=pd.to_datetime(preds['target_date']).astype('datetime64[ns]'),
+                         price=pd.to_numeric(preds['price'], errors='coerce')).sort_values('target_date')
+    closes = closes.assign(date=pd.to_datetime(closes['date']).astype('datetime64[ns]')).sort_values('date')
+    m = pd.merge_asof(preds, closes, left_on='target_date', right_on='date', by='ticker',
+                      direction='backward', tolerance=pd.Timedelta(days=5))
+    # 목표일 이전 마지막 거래일의 봉이 아직 없으면 채점하지 않음 (scored_at 이 남으면 다시 고칠 수 없음)
+    sessions = {d: pd.Timestamp(last_session_on_or_before(d.date())) for d in m['target_date'].unique().tolist()}
+    m = m[m['close'].notna() & (m['price'] > 0) & (m['date'] >= m['target_date'].map(sessions))]
+    ret = m['close'] / m['price'] - 1
+    m['return_pct'] = (ret * 100).round(4)
+    m['hit'] = np.select([m['verdict'].eq('BUY'), m['verdict'].eq('SELL')],
+                         [ret > 0, ret < 0], default=ret.abs() <= SCORE_HOLD_BAND)
+    m['close_price'] = m['close']
+    m['target_date'] = m['target_date'].dt.strftime('%Y-%m-%d')
+    return m[['id', 'user_id', 'ticker', 'price', 'verdict', 'target_date', 'close_price', 'return_pct', 'hit']]
+
+@timed("job.scoring")
+def run_prediction_scoring(batch_size=500):
+    # 재실행해도 안전: scored_at 이 비어있는 행만 대상, 결과는 id 기준 upsert
+    rows = fetch_matured_predictions()
+    if not rows: return {"matured": 0, "scored": 0, "hits": 0}
+    preds = pd.DataFrame(rows)
+    spans = preds.groupby('ticker')['target_date'].agg(['min', 'max'])
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        frames = list(pool.map(
+            lambda t: fetch_closes(t, str((pd.Timestamp(spans.at[t, 'min']) - pd.Timedelta(days=7)).date()), spans.at[t, 'max']),
+            spans.index))
+    frames = [f for f in frames if not f.empty]
+    if not frames: return {"matured": len(preds), "scored": 0, "hits": 0}
+    scored = score_predictions(preds, pd.concat(frames, ignore_index=True))
+    scored['scored_at'] = datetime.now(pytz.utc).isoformat()
+    records = json.loads(scored.to_json(orient='records'))
+    for i in range(0, len(records), batch_size):
+        supabase_service.table('predictions').upsert(records[i:i + batch_size], on_conflict='id').execute()
+    return {"matured": len(preds), "scored": len(scored), "hits": int(scored['hit'].sum())}
+
+# ---------------------------------------------------------
+# 4-8. 시세 캐시 (장 운영 시간에 따른 TTL + stale-while-revalidate)
+# ---------------------------------------------------------
+NY_TZ = pytz.timezone('America/New_York')
+QUOTE_TTL_REGULAR  = int(st.secrets.get("QUOTE_TTL_REGULAR", 15))
+QUOTE_TTL_EXTENDED = int(st.secrets.get("QUOTE_TTL_EXTENDED", 60))
+QUOTE_TTL_CLOSED_MAX = int(st.secrets.get("QUOTE_TTL_CLOSED_MAX", 6 * 3600))
+QUOTE_MAX_STALE = int(st.secrets.get("QUOTE_MAX_STALE", 600))
+# 규칙으로 계산되지 않는 임시 휴장일 (YYYY-MM-DD, 쉼표 구분)
+EXTRA_HOLIDAYS = {date.fromisoformat(x.strip()) for x in str(st.secrets.get("MARKET_HOLIDAYS", "")).split(",") if x.strip()}
+
+def _nth_weekday(year, month, weekday, n):
+    # n 번째 weekday (n=-1 이면 마지막)
+    if n > 0:
+        d = date(year, month, 1)
+        return d + timedelta(days=(weekday - d.weekday()) % 7 + 7 * (n - 1))
+    d = date(year + (month == 12), month % 12 + 1, 1) - timedelta(days=1)
+    return d - timedelta(days=(d.weekday() - weekday) % 7)
+
+def _easter(year):
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 19 * l) // 433
+    month = (h + l - 7 * m + 90) // 25
+    return date(year, month, (h + l - 7 * m + 33 * month + 19) % 32)
+
+@lru_cache(maxsize=16)
+def nyse_holidays(year):
+    def observed(d):
+        return d - timedelta(days=1) if d.weekday() == 5 else d + timedelta(days=1) if d.weekday() == 6 else d
+    days = {
+        _nth_weekday(year, 1, 0, 3),                 # MLK Day
+        _nth_weekday(year, 2, 0, 3),                 # Presidents' Day
+        _easter(year) - timedelta(days=2),           # Good Friday
+        _nth_weekday(year, 5, 0, -1),                # Memorial Day
+        observed(date(year, 7, 4)),
+        _nth_weekday(year, 9, 0, 1),                 # Labor Day
+        _nth_weekday(year, 11, 3, 4),                # Thanksgiving
+        observed(date(year, 12, 25)),
+    }
+    if date(year, 1, 1).weekday() != 5: days.add(observed(date(year, 1, 1)))   # 토요일 신정은 대체휴장 없음
+    if year >= 2022: days.add(observed(date(year, 6, 19)))                      # Juneteenth
+    return days
+
+def is_trading_day(d):
+    return d.weekday() < 5 and d not in nyse_holidays(d.year) and d not in EXTRA_HOLIDAYS
+
+def last_session_on_or_before(d):
+    while not is_trading_day(d): d -= timedelta(days=1)
+    return d
+
+def market_session(now=None):
+    # regular 09:30-16:00 · pre 04:00-09:30 · post 16:00-20:00 (ET)
+    now = (now or datetime.now(pytz.utc)).astimezone(NY_TZ)
+    if not is_trading_day(now.date()):
+        return "holiday" if now.weekday() < 5 else "closed"
+    hm = now.hour * 60 + now.minute
+    if 570 <= hm < 960: return "regular"
+    if 240 <= hm < 570: return "pre"
+    if 960 <= hm < 1200: return "post"
+    return "closed"
+
+def next_session_start(now=None):
+    # 다음 프리마켓 시작(04:00 ET) 시각
+    now = (now or datetime.now(pytz.utc)).astimezone(NY_TZ)
+    d = now.date()
+    if now.hour >= 4: d += timedelta(days=1)
+    while not is_trading_day(d): d += timedelta(days=1)
+    return NY_TZ.localize(datetime(d.year, d.month, d.day, 4))
+
+def quote_ttl(now=None):
+    now = now or datetime.now(pytz.utc)
+    session = market_session(now)
+    if session == "regular": return QUOTE_TTL_REGULAR
+    if session in ("pre", "post"): return QUOTE_TTL_EXTENDED
+    # 장이 닫혀 있으면 다음 세션 시작까지 값이 바뀌지 않음
+    return max(QUOTE_TTL_EXTENDED, min(QUOTE_TTL_CLOSED_MAX, (next_session_start(now) - now).total_seconds()))
+
+class QuoteCache:
+    # 만료 후 max_stale 초까지는 캐시 값을 즉시 반환하고 뒤에서 갱신
+    def __init__(self, max_stale):
+        self.max_stale = max_stale
+        self._entries = {}                 # symbol -> (quote, expires_at)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="quote-refresh")
+        self.hits = self.stale = self.misses = self.refreshes = 0
+
+    def put_many(self, rows):
+        expires = time.time() + quote_ttl()
+        with self._lock:
+            for q in rows or []:
+                if q.get('symbol'): self._entries[q['symbol']] = (q, expires)
+
+    def _fetch(self, symbols):
+        if len(symbols) == 1:
+            return _fmp_get("quote", f"symbol={symbols[0]}")
+        return _fmp_get("batch-quote", f"symbols={','.join(symbols)}")
+
+    def _revalidate(self, symbols):
+        try: self.put_many(self._fetch(symbols))
+        finally:
+            with self._lock: self._refreshing.difference_update(symbols)
+
+    def get_many(self, symbols):
+        now = time.time()
+        out, missing, stale = {}, [], []
+        with self._lock:
+            for sym in symbols:
+                q, expires = self._entries.get(sym, (None, 0))
+                if q is None or now >= expires + self.max_stale:
+                    missing.append(sym)
+                    continue
+                out[sym] = q
+                if now >= expires and sym not in self._refreshing: stale.append(sym)
+            self._refreshing.update(stale)
+            self.hits += len(out) - len(stale)
+            self.stale += len(stale)
+            self.misses += len(missing)
+        if stale:
+            self.refreshes += 1
+            self._pool.submit(self._revalidate, stale)
+        if missing:
+            rows = self._fetch(missing) or []
+            self.put_many(rows)
+            out.update({q['symbol']: q for q in rows if q.get('symbol') in missing})
+        return out
+
+    def get(self, symbol):
+        return self.get_many([symbol]).get(symbol)
+
+    def stats(self):
+        total = self.hits + self.stale + self.misses
+        return {"hits": self.hits, "stale": self.stale, "misses": self.misses, "refreshes": self.refreshes,
+                "hit_rate": (self.hits + self.stale) / total if total else 0.0, "size": len(self._entries)}
+
+@st.cache_resource
+def get_quote_cache():
+    return QuoteCache(QUOTE_MAX_STALE)
+
+quote_cache = get_quote_cache()
+
+# ---------------------------------------------------------
+# 4-9. 종목 심볼 색인 (자동완성 · 입력 검증)
+# ---------------------------------------------------------
+SYMBOL_REFRESH_SEC = int(st.secrets.get("SYMBOL_REFRESH_SEC", 24 * 3600))
+SYMBOL_SUGGESTIONS = 8
+
+class SymbolIndex:
+    # FMP 전체 종목 목록을 정렬 리스트 두 개(심볼 / 소문자 회사명)로 보관하고 bisect 로 접두사 검색
+    # 하루 한 번 백그라운드에서 새 색인을 만들어 통째로 교체. 로드 전에는 검증하지 않음 (None)
+    def __init__(self, refresh_sec):
+        self.refresh_sec = refresh_sec
+        self._index = None         # (symbols, symbol -> name, [(name, symbol)])
+        self.loaded_at = None
+        threading.Thread(target=self._run, name="symbol-index", daemon=True).start()
+
+    def _load(self):
+        names = {}
+        for r in _fmp_get("stock-list") or []:
+            sym = (r.get('symbol') or "").upper()
+            if sym: names[sym] = r.get('companyName') or r.get('name') or ""
+        if not names: return False
+        self._index = (sorted(names), names, sorted((n.lower(), s) for s, n in names.items() if n))
+        self.loaded_at = time.time()
+        return True
+
+    def _run(self):
+        while True:
+            try: ok = self._load()
+            except Exception: ok = False
+            time.sleep(self.refresh_sec if ok else 600)
+
+    def contains(self, symbol):
+        # True / False, 색인이 아직 없으면 None (업스트림 조회로 판단)
+        idx = self._index
+        return None if idx is None else symbol in idx[1]
+
+    def search(self, prefix, limit=SYMBOL_SUGGESTIONS):
+        # 심볼 접두사 일치 먼저, 남는 자리는 회사명 접두사 일치 → [(symbol, name)]
+        idx = self._index
+        if idx is None or not prefix: return []
+        symbols, names, by_name = idx
+        out = []
+        p = prefix.upper()
+        i = bisect_left(symbols, p)
+        while i < len(symbols) and len(out) < limit and symbols[i].startswith(p):
+            out.append(symbols[i]); i += 1
+        q = prefix.lower()
+        i = bisect_left(by_name, (q,))
+        while i < len(by_name) and len(out) < limit and by_name[i][0].startswith(q):
+            if by_name[i][1] not in out: out.append(by_name[i][1])
+            i += 1
+        return [(sym, names[sym]) for sym in out]
+
+    def stats(self):
+        idx = self._index
+        return {"symbols": len(idx[0]) if idx else 0, "loaded_at": self.loaded_at}
+
+@st.cache_resource
+def get_symbol_index():
+    return SymbolIndex(SYMBOL_REFRESH_SEC)
+
+symbol_index = get_symbol_index()
 
 # ---------------------------------------------------------
 # 5. 인증 로직
@@ -694,7 +2133,7 @@ with hcol2:
                 "queryParams": {"access_type": "offline", "prompt": "consent"}
             }
         })
-        st.link_button("→ SIGN IN WITH GOOGLE", auth_resp.url, use_container_width=True)
+        st.link_button("→ SIGN IN WITH GOOGLE", auth_resp.url, width="stretch")
     else:
         p = st.session_state["profile"]
         tier_text = "PREMIUM" if p['subscription_type'] == 'premium' else "FREE TIER"
@@ -710,19 +2149,14 @@ with hcol2:
             if st.button("SIGN OUT"):
                 supabase.auth.sign_out()
                 del st.session_state["user"]
+                st.session_state.pop("research_view", None)
+                st.session_state.pop("report_cursors", None)
                 st.rerun()
 
 # 티커 테이프
-tickers = [
-    ("SPY","597.42","+0.31%","up"), ("NVDA","875.20","+1.24%","up"),
-    ("AAPL","228.50","-0.18%","dn"), ("TSLA","182.30","+2.10%","up"),
-    ("MSFT","415.80","+0.55%","up"), ("AMZN","196.40","-0.44%","dn"),
-    ("META","578.90","+0.89%","up"), ("GOOGL","193.20","+0.22%","up"),
-    ("MU","98.40","-1.32%","dn"),   ("AMD","168.70","+1.88%","up"),
-]
 tape_items = "".join([
     f"<span class='ticker-item'><span class='ticker-sym'>{s}</span><span class='ticker-price'>{p}</span><span class='ticker-{d}'>{c}</span></span>"
-    for s,p,c,d in tickers
+    for s,p,c,d in get_quote_tape().items()
 ] * 2)
 st.markdown(f"<div class='ticker-tape'><div class='ticker-scroll'>{tape_items}</div></div>", unsafe_allow_html=True)
 
@@ -731,127 +2165,307 @@ st.markdown(f"<div class='ticker-tape'><div class='ticker-scroll'>{tape_items}</
 # ---------------------------------------------------------
 is_admin = "user" in st.session_state and st.session_state["user"].email == ADMIN_EMAIL
 tab_names = ["NOTICE", "QUANT RESEARCH", "ANALYST RANKING"]
+if "user" in st.session_state: tab_names.append("MY REPORTS")
 if is_admin: tab_names.append("SYSTEM ADMIN")
-tabs = st.tabs(tab_names)
+# on_change="rerun": 열린 탭만 실행 (숨은 탭의 Supabase 조회 생략)
+tabs = st.tabs(tab_names, key="main_tab", on_change="rerun")
 
 # ── Tab 1: NOTICE ──
-with tabs[0]:
+@st.fragment
+@timed("tab.notice")
+def notice_tab():
     st.markdown("<div class='section-label'>PLATFORM ANNOUNCEMENTS</div>", unsafe_allow_html=True)
-    notices = supabase.table('announcements').select("*").order('created_at', desc=True).execute()
-    if notices.data:
-        for n in notices.data:
+    limit = st.session_state.setdefault("notice_limit", NOTICE_PAGE_SIZE)
+    notices, has_older = get_announcements().list(limit)
+    if notices:
+        for n in notices:
             st.markdown(f"""
             <div class='notice-item'>
                 <div class='notice-date'>{n['created_at'][:10]} · TETRADES OFFICIAL</div>
                 {n['content']}
             </div>
             """, unsafe_allow_html=True)
+        if has_older:
+            st.button("LOAD OLDER", key="notice_more",
+                      on_click=lambda: st.session_state.update(notice_limit=limit + NOTICE_PAGE_SIZE))
     else:
         st.markdown("<div class='notice-item'><div class='notice-date'>SYSTEM</div>공지사항이 없습니다.</div>", unsafe_allow_html=True)
 
-# ── Tab 2: QUANT RESEARCH ──
-with tabs[1]:
-    st.markdown("<div class='section-label'>AI QUANT ANALYSIS ENGINE</div>", unsafe_allow_html=True)
-    user_is_premium = "user" in st.session_state and st.session_state["profile"]["subscription_type"] == "premium"
-
-    sc1, sc2, sc3 = st.columns([1, 2, 1])
-    with sc2:
-        ticker = st.text_input("TICKER SYMBOL", placeholder="MU  ·  NVDA  ·  AAPL").upper()
-        btn_text = "GENERATE REPORT  →" if user_is_premium else "GENERATE REPORT (AD-SUPPORTED)  →"
-        run = st.button(btn_text, type="primary", use_container_width=True)
+with tabs[0]:
+    if tabs[0].open: notice_tab()
 
-    if run and ticker:
-        s_data = fetch_fmp("quote", f"symbol={ticker}")
-        if s_data:
-            s = s_data[0]
-            chg = s.get('changesPercentage', 0)
-            chg_class = "metric-change-up" if chg >= 0 else "metric-change-dn"
-            chg_sign  = "▲" if chg >= 0 else "▼"
+# ── Tab 2: QUANT RESEARCH ──
+COMPARE_MAX = 5
+
+def render_quote_grid(s, tech):
+    chg = s.get('changePercentage', s.get('changesPercentage')) or 0
+    chg_class = "metric-change-up" if chg >= 0 else "metric-change-dn"
+    chg_sign  = "▲" if chg >= 0 else "▼"
+    tv = lambda k, fmt="{}": fmt.format(tech[k]) if tech.get(k) is not None else "N/A"
+    sma_trend = f"SMA50 {'>' if tech['sma50'] > tech['sma200'] else '<'} SMA200" if tech.get('sma50') and tech.get('sma200') else "SMA50/200 N/A"
+
+    st.markdown(f"""
+    <div class='metric-grid'>
+        <div class='metric-cell'>
+            <div class='metric-label'>CURRENT PRICE</div>
+            <div class='metric-value'>${s.get('price', 'N/A')}</div>
+            <div class='{chg_class}'>{chg_sign} {abs(chg):.2f}%</div>
+        </div>
+        <div class='metric-cell'>
+            <div class='metric-label'>MARKET CAP</div>
+            <div class='metric-value'>${s.get('marketCap', 0):,.0f}</div>
+        </div>
+        <div class='metric-cell'>
+            <div class='metric-label'>52W HIGH</div>
+            <div class='metric-value'>${s.get('yearHigh', 'N/A')}</div>
+        </div>
+        <div class='metric-cell'>
+            <div class='metric-label'>P/E RATIO</div>
+            <div class='metric-value'>{s.get('pe', 'N/A')}</div>
+        </div>
+        <div class='metric-cell'>
+            <div class='metric-label'>RSI (14)</div>
+            <div class='metric-value'>{tv('rsi14')}</div>
+        </div>
+        <div class='metric-cell'>
+            <div class='metric-label'>MACD HIST</div>
+            <div class='metric-value'>{tv('macd_hist')}</div>
+            <div class='metric-label'>{sma_trend}</div>
+        </div>
+        <div class='metric-cell'>
+            <div class='metric-label'>ATR (14)</div>
+            <div class='metric-value'>{tv('atr_pct', "{}%")}</div>
+        </div>
+        <div class='metric-cell'>
+            <div class='metric-label'>20D REALIZED VOL</div>
+            <div class='metric-value'>{tv('vol20_ann_pct', "{}%")}</div>
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
 
+def render_compare_grid(quotes):
+    # 종목별 컬럼을 그리고 VERDICT 배지 자리를 반환
+    cols = st.columns(len(quotes))
+    badges = {}
+    for col, (t, q) in zip(cols, quotes.items()):
+        chg = q.get('changePercentage', q.get('changesPercentage')) or 0
+        with col:
             st.markdown(f"""
-            <div class='metric-grid'>
+            <div class='metric-grid metric-grid-compact'>
                 <div class='metric-cell'>
-                    <div class='metric-label'>CURRENT PRICE</div>
-                    <div class='metric-value'>${s.get('price', 'N/A')}</div>
-                    <div class='{chg_class}'>{chg_sign} {abs(chg):.2f}%</div>
+                    <div class='metric-label'>{t} · CURRENT PRICE</div>
+                    <div class='metric-value'>${q.get('price', 'N/A')}</div>
+                    <div class='{"metric-change-up" if chg >= 0 else "metric-change-dn"}'>{"▲" if chg >= 0 else "▼"} {abs(chg):.2f}%</div>
                 </div>
                 <div class='metric-cell'>
                     <div class='metric-label'>MARKET CAP</div>
-                    <div class='metric-value'>${s.get('marketCap', 0):,.0f}</div>
-                </div>
-                <div class='metric-cell'>
-                    <div class='metric-label'>52W HIGH</div>
-                    <div class='metric-value'>${s.get('yearHigh', 'N/A')}</div>
+                    <div class='metric-value'>${(q.get('marketCap') or 0) / 1e9:,.1f}B</div>
                 </div>
                 <div class='metric-cell'>
                     <div class='metric-label'>P/E RATIO</div>
-                    <div class='metric-value'>{s.get('pe', 'N/A')}</div>
+                    <div class='metric-value'>{q.get('pe', 'N/A')}</div>
                 </div>
             </div>
             """, unsafe_allow_html=True)
+            badges[t] = st.empty()
+    return badges
+
+def start_research(tickers, tier, quotes, compare=False):
+    # 캐시에 없는 종목만 작업을 띄우고, 세션에는 작업 id 만 남김 → 화면은 report_panel 이 폴링
+    # 기술적 지표(일봉 조회 포함)도 스크립트 스레드가 아닌 백그라운드에서 계산
+    uid = st.session_state["user"].id
+    report_cache = get_report_cache()
+    view = {"compare": compare, "tier": tier, "quotes": quotes, "jobs": {}, "reports": {},
+            "tech": None if compare else get_enrich_pool().submit(fetch_technicals, tickers[0]),
+            "settled": set(), "ad_until": 0 if tier == "premium" else time.time() + AD_SECONDS,
+            "now_str": datetime.now().strftime("%Y-%m-%d %H:%M")}
+    for t in tickers:
+        key = report_cache_key(t, tier, quotes[t])
+        report = report_cache.get(key)
+        if report is not None: view["reports"][t] = report
+        else: view["jobs"][t] = start_report_job(t, quotes[t], tier, report_cache, key, user_id=uid).id
+    st.session_state["research_view"] = view
+
+def view_technicals(view):
+    return (view["tech"].result() or {}) if view["tech"] is not None and view["tech"].done() else {}
+
+def research_pending(view, uid):
+    if time.time() < view["ad_until"]: return True
+    if view["tech"] is not None and not view["tech"].done(): return True
+    return any((job := report_jobs.get(jid, uid)) is not None and not job.done.is_set() for jid in view["jobs"].values())
+
+def report_panel(view, uid):
+    # 광고 → 대기 순번 → 스트리밍 → 완료 순으로 그림. 작업이 끝나면 예측 저장 · 포인트 지급을 한 번만 수행
+    tier, now_str = view["tier"], view["now_str"]
+    states = {}
+    for t in view["quotes"]:
+        if t in view["reports"]: states[t] = ("done", view["reports"][t])
+        elif (job := report_jobs.get(view["jobs"][t], uid)) is None: states[t] = ("expired", None)
+        elif not job.done.is_set(): states[t] = ("running", job)
+        elif job.failed: states[t] = ("failed", job)
+        else: states[t] = ("done", job.text)
+
+    if view["compare"]:
+        badges = render_compare_grid(view["quotes"])
+    else:
+        render_quote_grid(*view["quotes"].values(), view_technicals(view))
+
+    remaining = view["ad_until"] - time.time()
+    if remaining > 0:
+        st.progress(1 - remaining / AD_SECONDS, text=f"SPONSORED · {math.ceil(remaining)}s")
+        return
+
+    for t, (state, val) in states.items():
+        if state != "done" or t in view["settled"]: continue
+        view["settled"].add(t)
+        v = parse_verdict(val)
+        snapshot = {"quote": view["quotes"][t], "technicals": view_technicals(view) or None}
+        report_id = save_report(uid, t, v, tier, val, snapshot)
+        save_prediction(uid, t, view["quotes"][t].get('price'), v, report_id)
+        award_points(uid, 10, "compare_report" if view["compare"] else "research_report",
+                     view["jobs"].get(t))
+
+    if view["compare"]:
+        for t, (state, val) in states.items():
+            if state == "running":
+                pos = val.position()
+                badges[t].markdown(f"<span class='verdict-hold'>{f'⧗ QUEUED #{pos}' if pos else '▌ ANALYZING'}</span>", unsafe_allow_html=True)
+            elif state in ("failed", "expired"):
+                badges[t].markdown("<span class='verdict-sell'>✕ FAILED</span>", unsafe_allow_html=True)
+            else:
+                v = parse_verdict(val)
+                v_class = {"BUY": "verdict-buy", "SELL": "verdict-sell"}.get(v, "verdict-hold")
+                v_icon  = {"BUY": "▲", "SELL": "▼"}.get(v, "—")
+                badges[t].markdown(f"<span class='{v_class}'>{v_icon} {v}</span>", unsafe_allow_html=True)
+        failed = [t for t, (state, _) in states.items() if state == "failed"]
+        if failed:
+            reasons = sorted({states[t][1].error.message for t in failed})
+            st.error(f"리포트 생성 실패: {', '.join(failed)} ({' · '.join(reasons)}) · 해당 종목은 예측으로 저장되지 않았습니다.")
+        expired = [t for t, (state, _) in states.items() if state == "expired"]
+        if expired:
+            st.warning(f"보관 기간이 지나 불러올 수 없는 리포트: {', '.join(expired)}")
+        for t, (state, val) in states.items():
+            if state != "done": continue
+            with st.expander(f"{t} · FULL REPORT"):
+                st.markdown(render_report_html(t, tier, val, parse_verdict(val), now_str), unsafe_allow_html=True)
+        return
+
+    t, (state, val) = next(iter(states.items()))
+    if state == "running":
+        # 대기 중에는 순번을, 이후에는 받은 부분까지 보여주고 다음 폴링에서 이어서 갱신
+        st.markdown(render_report_html(t, tier, val.text, None, now_str, queued=val.position()), unsafe_allow_html=True)
+    elif state == "failed":
+        st.error(f"리포트 생성에 실패했습니다 — {val.error.message}. 예측은 저장되지 않았습니다. 잠시 후 다시 시도하세요.")
+    elif state == "expired":
+        st.warning("보관 기간이 지나 리포트를 불러올 수 없습니다. 다시 생성하세요.")
+    else:
+        st.markdown(render_report_html(t, tier, val, parse_verdict(val), now_str), unsafe_allow_html=True)
+
+def research_view_fragment():
+    # 진행 중인 작업이 있을 때만 REPORT_POLL_SEC 간격으로 이 부분만 다시 실행
+    # 폴링 중에 모두 끝나면 전체를 한 번 다시 실행해 폴링을 멈춤 (사이드바 포인트도 함께 갱신)
+    view = st.session_state["research_view"]
+    uid = st.session_state["user"].id
+    pending = research_pending(view, uid)
+    if view.get("polling") and not pending:
+        view["polling"] = False
+        st.rerun()
+    report_panel(view, uid)
+
+research_started = time.perf_counter()
+with tabs[1]:
+    st.markdown("<div class='section-label'>AI QUANT ANALYSIS ENGINE</div>", unsafe_allow_html=True)
+    user_is_premium = "user" in st.session_state and st.session_state["profile"]["subscription_type"] == "premium"
+    tier = "premium" if user_is_premium else "free"
 
+    sc1, sc2, sc3 = st.columns([1, 2, 1])
+    with sc2:
+        compare_mode = st.toggle("COMPARISON MODE", key="compare_mode")
+        if compare_mode:
+            raw = st.text_input("TICKER LIST", placeholder=f"MU, NVDA, AMD  (최대 {COMPARE_MAX}개)")
+            compare_tickers = list(dict.fromkeys(re.findall(r"[A-Z0-9.\-]+", raw.upper())))[:COMPARE_MAX]
+            ticker = ""
+        else:
+            ticker = st.text_input("TICKER SYMBOL", placeholder="MU  ·  NVDA  ·  AAPL  ·  NVIDIA", key="ticker_input").strip().upper()
+            # 색인에 없는 입력이면 심볼 / 회사명 접두사 후보를 보여주고, 고르면 입력칸을 채움
+            hints = dict(symbol_index.search(ticker)) if symbol_index.contains(ticker) is False else {}
+            if hints:
+                st.pills("SUGGESTIONS", list(hints), format_func=lambda t: f"{t} · {hints[t]}" if hints[t] else t,
+                         key="ticker_pick", label_visibility="collapsed",
+                         on_change=lambda: st.session_state.update(ticker_input=st.session_state["ticker_pick"] or ticker))
+        btn_text = "GENERATE REPORT  →" if user_is_premium else "GENERATE REPORT (AD-SUPPORTED)  →"
+        run = st.button(btn_text, type="primary", width="stretch")
+
+    if run and compare_mode and compare_tickers:
+        # 시세는 batch-quote 1회, 리포트 동시 실행 수는 승인 제어의 사용자별 상한을 따름
+        try:
+            # 색인에 없는 티커는 업스트림에 묻지 않음
+            quotes = quote_cache.get_many([t for t in compare_tickers if symbol_index.contains(t) is not False])
+            missing = [t for t in compare_tickers if t not in quotes]
+            if missing: st.warning(f"티커를 찾을 수 없습니다: {', '.join(missing)}")
+            found = {t: quotes[t] for t in compare_tickers if t in quotes}
+            if found and "user" in st.session_state:
+                start_research(list(found), tier, found, compare=True)
+            elif found:
+                render_compare_grid(found)
+                st.warning("로그인 후 무료로 리포트를 확인하세요.")
+        except UpstreamError as e:
+            st.error(f"시세 조회 실패 — {e.message}. 잠시 후 다시 시도하세요.")
+
+    if run and ticker and symbol_index.contains(ticker) is False:
+        st.error(f"티커 '{ticker}'를 찾을 수 없습니다.")
+    elif run and ticker:
+        quote_error = None
+        try: s = quote_cache.get(ticker)
+        except UpstreamError as e: s, quote_error = None, e
+        if s:
             if "user" not in st.session_state:
+                render_quote_grid(s, fetch_technicals(ticker) or {})
                 st.warning("로그인 후 무료로 리포트를 확인하세요.")
                 st.markdown("<div class='report-wrapper'><div class='report-body teaser-blur'><h3>TETRADES QUANT REPORT</h3><p>분석 결과는 로그인 후 확인 가능합니다...</p></div></div>", unsafe_allow_html=True)
             else:
-                if not user_is_premium:
-                    ad_place = st.empty()
-                    with ad_place.container():
-                        prog_bar = st.progress(0)
-                        for i in range(100):
-                            time.sleep(0.05)
-                            prog_bar.progress(i + 1)
-                            if i % 20 == 0:
-                                remaining = 5 - (i // 20)
-                    ad_place.empty()
-
-                tier = "premium" if user_is_premium else "free"
-                with st.spinner("ANALYZING MARKET DATA..."):
-                    report = generate_ai_report(ticker, s, tier)
-
-                v = report.split("[VERDICT:")[1].split("]")[0].strip() if "[VERDICT:" in report else "HOLD"
-                v_class = {"BUY": "verdict-buy", "SELL": "verdict-sell"}.get(v, "verdict-hold")
-                v_icon  = {"BUY": "▲", "SELL": "▼"}.get(v, "—")
-
-                now_str = datetime.now().strftime("%Y-%m-%d %H:%M")
-                st.markdown(f"""
-                <div class='report-wrapper'>
-                    <div class='report-header'>
-                        <span class='report-header-title'>TETRADES QUANT REPORT · {ticker}</span>
-                        <span>{now_str} KST · {tier.upper()} TIER</span>
-                    </div>
-                    <div class='report-body'>{report}</div>
-                    <div class='report-footer'>
-                        <span class='{v_class}'>{v_icon} {v}</span>
-                        &nbsp;&nbsp;
-                        ⚠ 본 리포트는 AI 생성 참고용 정보이며 투자 권유가 아닙니다. 투자 결과에 대한 책임은 투자자 본인에게 있습니다.
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
-
-                uid = st.session_state["user"].id
-                save_prediction(uid, ticker, s.get('price'), v)
-                pts = st.session_state["profile"]["points"]
-                update_profile(uid, {"points": pts + 10})
+                # 버튼을 누른 즉시 생성 시작 → 광고 카운트다운과 LLM 대기 시간이 겹침
+                start_research([ticker], tier, {ticker: s})
+        elif quote_error:
+            st.error(f"시세 조회 실패 — {quote_error.message}. 잠시 후 다시 시도하세요.")
         else:
             st.error(f"티커 '{ticker}'를 찾을 수 없습니다.")
 
+    if "research_view" in st.session_state and "user" in st.session_state:
+        view = st.session_state["research_view"]
+        view["polling"] = research_pending(view, st.session_state["user"].id)
+        st.fragment(research_view_fragment, run_every=REPORT_POLL_SEC if view["polling"] else None)()
+
+telemetry.record("tab.research", (time.perf_counter() - research_started) * 1000)
+
 # ── Tab 3: RANKING ──
-with tabs[2]:
+@st.fragment
+@timed("tab.ranking")
+def ranking_tab():
     st.markdown("<div class='section-label'>ELITE ANALYST LEADERBOARD</div>", unsafe_allow_html=True)
-    if "user" in st.session_state:
+    board = get_leaderboard()
+    my_id = st.session_state["user"].id if "user" in st.session_state else None
+    if my_id:
         p = st.session_state["profile"]
+        me = board.lookup(my_id, p.get('points', 0))
         st.markdown(f"<span style='font-family:var(--font-mono);font-size:0.72rem;color:var(--text-dim);'>SIGNED IN AS </span><span style='font-family:var(--font-mono);font-size:0.72rem;color:var(--gold);'>{p.get('nickname','').upper()}</span><span style='font-family:var(--font-mono);font-size:0.72rem;color:var(--text-dim);'> · REFERRAL: {p['referral_code']} · POINTS: {p['points']}</span>", unsafe_allow_html=True)
+        st.markdown(f"""
+        <div class='stat-block'>
+            <div class='stat-block-num'>#{me['rank']:,}</div>
+            <div class='stat-block-label'>MY RANK · OF {me['total']:,} ANALYSTS · TOP {me['top_pct']:.1f}% · {me['points']:,} PTS AS OF {datetime.fromtimestamp(me['as_of']).strftime('%H:%M:%S')}</div>
+        </div>
+        """, unsafe_allow_html=True)
         st.markdown("<div style='height:16px'></div>", unsafe_allow_html=True)
 
-    ranks = supabase.table('profiles').select("nickname,email,points,subscription_type").order('points', desc=True).limit(10).execute()
-    if ranks.data:
+    page = st.session_state.get("rank_page", 0)
+    ranks, listed = board.page(page * RANK_PAGE_SIZE)
+    if ranks:
         rows = ""
-        for i, r in enumerate(ranks.data):
-            name   = r.get('nickname') or r['email'].split('@')[0]
+        for r in ranks:
+            name   = r.get('nickname') or "analyst"
             badge  = "◆" if r['subscription_type'] == 'premium' else "·"
-            rank_class = "rank-1" if i == 0 else ""
-            rows += f"<tr class='{rank_class}'><td>#{i+1}</td><td class='analyst'>{badge} {name.upper()}</td><td class='points'>{r['points']:,} PTS</td></tr>"
+            rank_class = " ".join(c for c, on in (("rank-1", r['rank'] == 1), ("rank-me", r['id'] == my_id)) if on)
+            rows += f"<tr class='{rank_class}'><td>#{r['rank']}</td><td class='analyst'>{badge} {name.upper()}</td><td class='points'>{r['points']:,} PTS</td></tr>"
 
         st.markdown(f"""
         <table class='rank-table'>
@@ -859,50 +2473,172 @@ with tabs[2]:
             <tbody>{rows}</tbody>
         </table>
         """, unsafe_allow_html=True)
+        last = (page + 1) * RANK_PAGE_SIZE >= listed
+        rk1, rk2, rk3 = st.columns([1, 4, 1])
+        with rk1:
+            st.button("← PREV", key="rank_prev", disabled=page == 0, width="stretch",
+                      on_click=lambda: st.session_state.update(rank_page=page - 1))
+        with rk2:
+            st.markdown(f"<div style='text-align:center;font-family:var(--font-mono);font-size:0.7rem;color:var(--text-dim);padding-top:10px;'>#{page * RANK_PAGE_SIZE + 1}–#{page * RANK_PAGE_SIZE + len(ranks)} · TOP {listed}</div>", unsafe_allow_html=True)
+        with rk3:
+            st.button("NEXT →", key="rank_next", disabled=last, width="stretch",
+                      on_click=lambda: st.session_state.update(rank_page=page + 1))
 
-# ── Tab 4: ADMIN ──
-if is_admin:
-    with tabs[3]:
-        st.markdown("<div class='section-label'>SYSTEM ADMINISTRATION</div>", unsafe_allow_html=True)
-        adm1, adm2 = st.columns(2)
-
-        with adm1:
-            st.markdown("<div class='section-label'>NOTICE MANAGEMENT</div>", unsafe_allow_html=True)
-            new_msg = st.text_area("COMPOSE ANNOUNCEMENT", height=100)
-            if st.button("PUBLISH", type="primary"):
-                if new_msg:
-                    supabase.table('announcements').insert({"content": new_msg}).execute()
-                    st.success("PUBLISHED"); st.rerun()
-            st.divider()
-            current_notices = supabase.table('announcements').select("*").order('created_at', desc=True).execute()
-            if current_notices.data:
-                notice_list = {f"[{n['created_at'][:10]}] {n['content'][:30]}...": n['id'] for n in current_notices.data}
-                target = st.selectbox("SELECT TO DELETE", options=list(notice_list.keys()))
-                if st.button("DELETE SELECTED"):
-                    supabase.table('announcements').delete().eq('id', notice_list[target]).execute()
-                    st.success("DELETED"); st.rerun()
-
-        with adm2:
-            st.markdown("<div class='section-label'>PLATFORM METRICS</div>", unsafe_allow_html=True)
-            u_all = supabase.table('profiles').select("*").execute()
-            p_all = supabase.table('predictions').select("*").execute()
-            u_count = len(u_all.data) if u_all.data else 0
-            p_count = len(p_all.data) if p_all.data else 0
-            st.markdown(f"""
-            <div class='stat-block'>
-                <div class='stat-block-num'>{u_count:,}</div>
-                <div class='stat-block-label'>REGISTERED ANALYSTS</div>
-            </div>
-            <div class='stat-block'>
-                <div class='stat-block-num'>{p_count:,}</div>
-                <div class='stat-block-label'>AI REPORTS GENERATED</div>
-            </div>
-            """, unsafe_allow_html=True)
-
+with tabs[2]:
+    if tabs[2].open: ranking_tab()
+
+# ── Tab 4: MY REPORTS ──
+@st.fragment
+@timed("tab.reports")
+def reports_tab():
+    # 목록은 (created_at, id) keyset 으로 한 페이지씩, 본문은 펼칠 때만 조회
+    uid = st.session_state["user"].id
+    st.markdown("<div class='section-label'>MY REPORTS</div>", unsafe_allow_html=True)
+    cursors = st.session_state.setdefault("report_cursors", [None])
+    rows, has_next = fetch_report_page(uid, cursors[-1])
+    if not rows:
+        st.info("아직 저장된 리포트가 없습니다." if len(cursors) == 1 else "더 이상 리포트가 없습니다.")
+    for r in rows:
+        when = pd.Timestamp(r['created_at']).strftime('%Y-%m-%d %H:%M')
+        icon = {"BUY": "▲", "SELL": "▼"}.get(r['verdict'], "—")
+        exp = st.expander(f"{when} · {r['ticker']} · {icon} {r['verdict']} · {r['tier'].upper()} · {r['model']}",
+                          key=f"report_{r['id']}", on_change="rerun")
+        with exp:
+            if not exp.open: continue
+            body, snapshot = fetch_report_body(r['id'], uid)
+            if body is None:
+                st.warning("리포트를 불러올 수 없습니다.")
+                continue
+            st.markdown(render_report_html(r['ticker'], r['tier'], body, r['verdict'], when), unsafe_allow_html=True)
+            if snapshot:
+                st.json(snapshot, expanded=False)
+    rp1, rp2, rp3 = st.columns([1, 4, 1])
+    with rp1:
+        st.button("← PREV", key="reports_prev", disabled=len(cursors) == 1, width="stretch", on_click=cursors.pop)
+    with rp2:
+        st.markdown(f"<div style='text-align:center;font-family:var(--font-mono);font-size:0.7rem;color:var(--text-dim);padding-top:10px;'>PAGE {len(cursors)} · {len(rows)} REPORTS</div>", unsafe_allow_html=True)
+    with rp3:
+        st.button("NEXT →", key="reports_next", disabled=not has_next, width="stretch",
+                  on_click=cursors.append, args=((rows[-1]['created_at'], rows[-1]['id']) if has_next else None,))
+
+if "MY REPORTS" in tab_names:
+    reports_idx = tab_names.index("MY REPORTS")
+    with tabs[reports_idx]:
+        if tabs[reports_idx].open: reports_tab()
+
+# ── Tab 5: ADMIN ──
+@st.fragment
+@timed("tab.admin")
+def admin_tab():
+    st.markdown("<div class='section-label'>SYSTEM ADMINISTRATION</div>", unsafe_allow_html=True)
+    adm1, adm2 = st.columns(2)
+
+    with adm1:
+        st.markdown("<div class='section-label'>NOTICE MANAGEMENT</div>", unsafe_allow_html=True)
+        new_msg = st.text_area("COMPOSE ANNOUNCEMENT", height=100)
+        if st.button("PUBLISH", type="primary"):
+            if new_msg:
+                get_announcements().publish(new_msg)
+                st.success("PUBLISHED"); st.rerun()
         st.divider()
-        st.markdown("<div class='section-label'>USER DATABASE</div>", unsafe_allow_html=True)
-        if u_all.data:
-            st.dataframe(pd.DataFrame(u_all.data), use_container_width=True)
+        current_notices, _ = get_announcements().list(st.session_state.get("notice_limit", NOTICE_PAGE_SIZE))
+        if current_notices:
+            notice_list = {f"[{n['created_at'][:10]}] {n['content'][:30]}...": n['id'] for n in current_notices}
+            target = st.selectbox("SELECT TO DELETE", options=list(notice_list.keys()))
+            if st.button("DELETE SELECTED"):
+                get_announcements().delete(notice_list[target])
+                st.success("DELETED"); st.rerun()
+
+    with adm2:
+        st.markdown("<div class='section-label'>PLATFORM METRICS</div>", unsafe_allow_html=True)
+        u_count = count_rows('profiles')
+        p_count = count_rows('predictions')
+        rc = get_report_cache().stats()
+        sf = fmp_flights.stats()
+        qc = quote_cache.stats()
+        ad = admission.stats()
+        wq_pending = write_queue.pending()
+        si = symbol_index.stats()
+        st.markdown(f"""
+        <div class='stat-block'>
+            <div class='stat-block-num'>{u_count:,}</div>
+            <div class='stat-block-label'>REGISTERED ANALYSTS</div>
+        </div>
+        <div class='stat-block'>
+            <div class='stat-block-num'>{p_count:,}</div>
+            <div class='stat-block-label'>AI REPORTS GENERATED</div>
+        </div>
+        <div class='stat-block'>
+            <div class='stat-block-num'>{rc['hit_rate']:.0%}</div>
+            <div class='stat-block-label'>REPORT CACHE HIT RATE · {rc['hits']:,} HIT / {rc['misses']:,} MISS · {rc['size']:,} CACHED</div>
+        </div>
+        <div class='stat-block'>
+            <div class='stat-block-num'>{sf['absorbed']:,}</div>
+            <div class='stat-block-label'>FMP CALLS COALESCED · {sf['flights']:,} UPSTREAM FLIGHTS · MAX {sf['max_absorbed']:,} PER FLIGHT</div>
+        </div>
+        <div class='stat-block'>
+            <div class='stat-block-num'>{qc['hit_rate']:.0%}</div>
+            <div class='stat-block-label'>QUOTE CACHE HIT RATE · {market_session().upper()} SESSION · {qc['stale']:,} STALE SERVED · {qc['misses']:,} MISS</div>
+        </div>
+        <div class='stat-block'>
+            <div class='stat-block-num'>{ad['running']} / {admission.max_concurrency}</div>
+            <div class='stat-block-label'>OPENAI IN FLIGHT · {ad['queued']:,} QUEUED · {ad['tokens_1m']:,} / {admission.tpm:,} TPM · {ad['rejected']:,} REJECTED</div>
+        </div>
+        <div class='stat-block'>
+            <div class='stat-block-num'>{wq_pending:,}</div>
+            <div class='stat-block-label'>PENDING WRITES · {write_queue.written:,} WRITTEN · {write_queue.failures:,} FAILED ATTEMPTS · {len(write_queue.dead):,} DEAD-LETTERED</div>
+        </div>
+        <div class='stat-block'>
+            <div class='stat-block-num'>{si['symbols']:,}</div>
+            <div class='stat-block-label'>SYMBOLS INDEXED · {datetime.fromtimestamp(si['loaded_at']).strftime('%Y-%m-%d %H:%M') if si['loaded_at'] else 'NOT LOADED'}</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    st.divider()
+    st.markdown("<div class='section-label'>LATENCY PROFILE</div>", unsafe_allow_html=True)
+    lat = telemetry.summary()
+    if lat.empty:
+        st.info("아직 기록된 구간이 없습니다.")
+    else:
+        st.dataframe(lat, width="stretch")
+    st.markdown("<div class='section-label'>UPSTREAM HEALTH</div>", unsafe_allow_html=True)
+    st.dataframe(pd.DataFrame(http.health()), width="stretch", hide_index=True)
+    if write_queue.dead:
+        st.markdown("<div class='section-label'>DEAD-LETTERED WRITES</div>", unsafe_allow_html=True)
+        st.dataframe(pd.DataFrame(list(write_queue.dead)[::-1]), width="stretch", hide_index=True)
+
+    st.divider()
+    st.markdown("<div class='section-label'>PREDICTION SCORING</div>", unsafe_allow_html=True)
+    if st.button("SCORE MATURED PREDICTIONS"):
+        with st.spinner("SCORING..."):
+            res = run_prediction_scoring()
+        hit_rate = res['hits'] / res['scored'] if res['scored'] else 0
+        st.success(f"MATURED {res['matured']:,} · SCORED {res['scored']:,} · HIT {res['hits']:,} ({hit_rate:.0%})")
+
+    st.divider()
+    st.markdown("<div class='section-label'>USER DATABASE</div>", unsafe_allow_html=True)
+    db_search = st.text_input("SEARCH EMAIL / HANDLE", key="user_db_search")
+    if st.session_state.get("user_db_query") != db_search:
+        st.session_state["user_db_query"] = db_search
+        st.session_state["user_db_cursors"] = [None]
+    cursors = st.session_state["user_db_cursors"]
+    page_rows, has_next = fetch_user_page(cursors[-1], db_search)
+    if page_rows:
+        st.dataframe(pd.DataFrame(page_rows), width="stretch")
+    else:
+        st.info("검색 결과가 없습니다.")
+    pg1, pg2, pg3 = st.columns([1, 4, 1])
+    with pg1:
+        st.button("← PREV", disabled=len(cursors) == 1, width="stretch", on_click=cursors.pop)
+    with pg2:
+        st.markdown(f"<div style='text-align:center;font-family:var(--font-mono);font-size:0.7rem;color:var(--text-dim);padding-top:10px;'>PAGE {len(cursors)} · {len(page_rows)} ROWS</div>", unsafe_allow_html=True)
+    with pg3:
+        st.button("NEXT →", disabled=not has_next, width="stretch",
+                  on_click=cursors.append, args=(page_rows[-1]['id'] if has_next else None,))
+
+if is_admin:
+    with tabs[-1]:
+        if tabs[-1].open: admin_tab()
 
 # ── FOOTER ──
 st.markdown("""
@@ -912,3 +2648,4 @@ st.markdown("""
     투자 결과에 대한 모든 책임은 투자자 본인에게 있습니다. 과거 성과가 미래 수익을 보장하지 않습니다.
 </div>
 """, unsafe_allow_html=True)
+telemetry.record("rerun.total", (time.perf_counter() - rerun_started) * 1000)
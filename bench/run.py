@@ -0,0 +1,337 @@
+"""TETRADES 오프라인 벤치마크 / 부하 테스트.
+
+로컬 대역 서버(bench/stubs.py)를 띄우고 Streamlit AppTest 로 APP.py 를 헤드리스로 구동합니다.
+세션마다 anonymous / free / premium / admin 중 하나로 모든 탭을 돌며 rerun 단위 지연,
+업스트림 호출 수, 프로세스 최대 메모리를 측정하고 결과를 bench/results/ 에 JSON 으로 남깁니다.
+
+    python bench/run.py --sessions 8 --rounds 2 --latency fmp=0.08,openai=0.4 --error-rate fmp=0.02
+    python bench/run.py --compare bench/results/A.json bench/results/B.json
+
+측정은 매번 새 프로세스에서 수행되므로 st.cache_* 와 피크 RSS 가 회차 간에 섞이지 않습니다.
+"""
+import argparse, json, platform, random, resource, shutil, subprocess, sys, tempfile, time, types
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / "bench" / "results"
+PERSONAS = ("anonymous", "free", "premium", "admin")
+ADMIN_EMAIL = "admin@bench.local"
+TICKERS = ("MU", "NVDA", "AAPL", "AMD", "TSLA")
+POLL_SEC = 0.1
+SEED_REPORTS = 25   # 세션 사용자별 과거 리포트 (MY REPORTS 한 페이지 20건 + 다음 페이지)
+
+
+def parse_map(text, default=0.0):
+    # "fmp=0.08,openai=0.4" 또는 "0.05" (세 서비스 모두) 형식
+    from stubs import SERVICES
+    out = dict.fromkeys(SERVICES, default)
+    for part in filter(None, (text or "").split(",")):
+        if "=" in part:
+            k, v = part.split("=", 1)
+            if k not in SERVICES: raise SystemExit(f"unknown service '{k}' (choose from {', '.join(SERVICES)})")
+            out[k] = float(v)
+        else:
+            out = dict.fromkeys(SERVICES, float(part))
+    return out
+
+
+# ---------------------------------------------------------
+# 세션 시나리오
+# ---------------------------------------------------------
+def persona_state(persona, idx, stub):
+    if persona == "anonymous": return None
+    uid = f"bench-{persona}-{idx}"
+    email = ADMIN_EMAIL if persona == "admin" else f"{persona}{idx}@bench.local"
+    profile = {"id": uid, "email": email, "nickname": f"{persona}{idx}", "points": 0, "referral_code": f"B{idx:06d}",
+               "subscription_type": "free" if persona == "free" else "premium", "is_onboarded": True, "referred_by": None}
+    stub.add_profile(profile)
+    stub.add_reports(uid, SEED_REPORTS)
+    return types.SimpleNamespace(id=uid, email=email), profile
+
+
+def widget(items, label):
+    return next((w for w in items if w.label.startswith(label)), None)
+
+
+def scenario(persona, rng):
+    # (step, action) — action 은 at.run() 직전에 위젯 상태를 바꿈
+    def tab(name):
+        return lambda at: at.session_state.__setitem__("main_tab", name)
+
+    def research(at):
+        widget(at.text_input, "TICKER SYMBOL").input(rng.choice(TICKERS))
+        widget(at.button, "GENERATE REPORT").click()
+
+    def compare(at):
+        widget(at.text_input, "TICKER LIST").input(", ".join(rng.sample(TICKERS, 3)))
+        widget(at.button, "GENERATE REPORT").click()
+
+    def click(label):
+        def act(at):
+            b = widget(at.button, label)
+            if b is not None and not b.disabled: b.click()
+        return act
+
+    def on_tab(name, action):
+        # AppTest 는 이후 run 에서 main_tab 을 기본 탭으로 되돌리므로 탭 안 동작 전에 다시 지정
+        def act(at):
+            tab(name)(at)
+            action(at)
+        return act
+
+    def expand_report(at):
+        # 목록 첫 리포트를 펼쳐 본문 조회까지 측정
+        e = next((e for e in at.expander if (e.key or "").startswith("report_")), None)
+        if e is not None: at.session_state[e.key] = True
+
+    steps = [("load", None),
+             ("notice.older", click("LOAD OLDER")),
+             ("tab.research", tab("QUANT RESEARCH")),
+             ("research.single", research)]
+    if persona != "anonymous":
+        steps += [("research.compare_on", lambda at: widget(at.toggle, "COMPARISON MODE").set_value(True)),
+                  ("research.compare", compare)]
+    steps += [("tab.ranking", tab("ANALYST RANKING"))]
+    if persona != "anonymous":
+        steps += [("tab.reports", tab("MY REPORTS")),
+                  ("reports.expand", on_tab("MY REPORTS", expand_report)),
+                  ("reports.next_page", on_tab("MY REPORTS", click("NEXT →")))]
+    if persona == "admin":
+        steps += [("tab.admin", tab("SYSTEM ADMIN")),
+                  ("admin.next_page", on_tab("SYSTEM ADMIN", click("NEXT →")))]
+    steps += [("tab.notice", tab("NOTICE"))]
+    return steps
+
+
+def drive_session(idx, persona, rnd, secrets, stub, timeout, seed):
+    from streamlit.testing.v1 import AppTest
+    rng = random.Random(seed * 1000 + idx)
+    at = AppTest.from_file(str(ROOT / "APP.py"), default_timeout=timeout)
+    for k, v in secrets.items(): at.secrets[k] = v
+    state = persona_state(persona, idx, stub)
+    if state:
+        at.session_state["user"], at.session_state["profile"] = state
+    samples = []
+    for step, action in scenario(persona, rng):
+        err = None
+        t0 = time.perf_counter()
+        try:
+            if action: action(at)
+            at.run()
+            # AppTest 는 run_every 폴링을 돌리지 않으므로 리포트 작업이 끝날 때까지 직접 다시 실행
+            while "research_view" in at.session_state and at.session_state["research_view"].get("polling") and not at.exception:
+                time.sleep(POLL_SEC)
+                at.run()
+            if at.exception: err = at.exception[0].message
+        except Exception as e:
+            err = f"{type(e).__name__}: {e}"
+        samples.append({"round": rnd, "session": idx, "persona": persona, "step": step,
+                        "ms": round((time.perf_counter() - t0) * 1000, 2), "ok": err is None, "error": err})
+        if err and not at.main: break
+    return samples
+
+
+def share_harness_state(secrets):
+    # AppTest 는 run() 마다 Runtime 싱글턴 · st.secrets · config 를 바꿔 끼웠다가 되돌리므로
+    # 세션을 스레드로 동시에 돌리면 서로를 깨뜨림 → 프로세스 전역 상태를 한 번만 세팅하고 공유
+    import streamlit as st
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    shared = app_test.MagicMock(spec=Runtime)
+    shared.media_file_mgr = app_test.MediaFileManager(app_test.MemoryMediaFileStorage("/mock/media"))
+    shared.dataframe_source_mgr = app_test.DataframeSourceManager()
+    shared.cache_storage_manager = app_test.MemoryCacheStorageManager()
+    shared.bidi_component_registry = app_test.BidiComponentManager()
+    shared.bidi_component_registry.discover_and_register_components(start_file_watching=False)
+    Runtime._instance = shared
+
+    class SessionRuntime(Runtime): pass   # AppTest 가 run 마다 갈아끼우는 대상
+    app_test.Runtime = SessionRuntime
+    # 실제 서버처럼 바이트코드를 세션 간 공유 (3.11 의 ast.parse 는 동시 호출에 안전하지 않음)
+    script_cache = app_test.ScriptCache()
+    script_cache.get_bytecode(str(ROOT / "APP.py"))
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+
+    st.secrets = app_test.Secrets()
+    st.secrets._secrets = dict(secrets)
+    config.set_option("global.appTest", True)
+
+
+# ---------------------------------------------------------
+# 측정 (별도 프로세스에서 실행)
+# ---------------------------------------------------------
+def run_trial(cfg):
+    sys.path.insert(0, str(ROOT / "bench"))
+    from stubs import StubServer
+    stub = StubServer(latency=cfg["latency"], error_rate=cfg["error_rate"], chunk_delay=cfg["chunk_delay"])
+    stub.seed(users=cfg["seed_users"])
+    work = Path(tempfile.mkdtemp(prefix="tetrades-bench-"))
+    secrets = {"SUPABASE_URL": stub.url, "SUPABASE_KEY": "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.bench",
+               "SUPABASE_SERVICE_KEY": "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.bench",
+               "OPENAI_API_KEY": "sk-bench", "FMP_API_KEY": "bench", "ADMIN_EMAIL": ADMIN_EMAIL,
+               "FMP_BASE_URL": stub.url + "/stable", "OPENAI_BASE_URL": stub.url + "/v1",
+               "PRICE_STORE_DIR": str(work / "prices"), "TELEMETRY_LOG": str(work / "spans.jsonl"),
+               "AD_SECONDS": cfg["ad_seconds"]}
+    share_harness_state(secrets)
+
+    samples, started = [], time.perf_counter()
+    for rnd in range(cfg["rounds"]):
+        with ThreadPoolExecutor(max_workers=cfg["sessions"]) as pool:
+            futures = [pool.submit(drive_session, i, PERSONAS[i % len(PERSONAS)], rnd, secrets, stub,
+                                   cfg["timeout"], cfg["seed"] + rnd) for i in range(cfg["sessions"])]
+            for f in futures: samples += f.result()
+    wall = time.perf_counter() - started
+    time.sleep(cfg["settle"])   # write-behind 큐가 비워질 시간
+
+    spans = []
+    if (work / "spans.jsonl").exists():
+        spans = [json.loads(line) for line in (work / "spans.jsonl").read_text().splitlines() if line]
+    stub.close()
+    shutil.rmtree(work, ignore_errors=True)
+    return {"samples": samples, "wall_s": round(wall, 2), "calls": stub.calls, "injected_errors": stub.errors,
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1), "spans": spans}
+
+
+def pct(s, q):
+    return round(float(s.quantile(q)), 1) if len(s) else None
+
+
+def summarize(raw):
+    df = pd.DataFrame(raw["samples"])
+    steps = (df.groupby(["persona", "step"], sort=False)["ms"]
+               .agg(runs="count", p50=lambda s: pct(s, .5), p95=lambda s: pct(s, .95), max="max")
+               .reset_index())
+    errors = df.groupby(["persona", "step"], sort=False)["ok"].apply(lambda s: int((~s).sum())).values
+    steps["errors"] = errors
+    by_service = {}
+    for key, n in raw["calls"].items():
+        svc = key.split(" ", 1)[0]
+        by_service[svc] = by_service.get(svc, 0) + n
+    spans = pd.DataFrame(raw["spans"])
+    span_stats = []
+    if not spans.empty:
+        g = spans.groupby("span")
+        span_stats = (g["ms"].agg(calls="count", p50=lambda s: pct(s, .5), p95=lambda s: pct(s, .95))
+                      .assign(error_rate=1 - g["ok"].mean()).round(3).reset_index().to_dict("records"))
+    return {
+        "reruns": {"count": len(df), "p50_ms": pct(df["ms"], .5), "p95_ms": pct(df["ms"], .95),
+                   "p99_ms": pct(df["ms"], .99), "max_ms": float(df["ms"].max()), "errors": int((~df["ok"]).sum())},
+        "steps": steps.to_dict("records"),
+        "upstream": {"by_service": by_service, "by_endpoint": dict(sorted(raw["calls"].items())),
+                     "injected_errors": raw["injected_errors"]},
+        "app_spans": span_stats,
+        "peak_rss_mb": raw["peak_rss_mb"],
+        "wall_s": raw["wall_s"],
+        "failures": sorted({s["error"] for s in raw["samples"] if s["error"]})[:20],
+    }
+
+
+def git_meta():
+    def git(*args):
+        try: return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, timeout=30).stdout.strip()
+        except Exception: return ""
+    return {"commit": git("rev-parse", "HEAD"), "subject": git("log", "-1", "--format=%s"),
+            "dirty": bool(git("status", "--porcelain", "--", "APP.py"))}
+
+
+def print_report(res):
+    r = res["summary"]["reruns"]
+    print(f"\n{res['meta']['commit'][:10]}  sessions={res['config']['sessions']} rounds={res['config']['rounds']}  "
+          f"wall={res['summary']['wall_s']}s  peak_rss={res['summary']['peak_rss_mb']}MB")
+    print(f"reruns={r['count']}  p50={r['p50_ms']}ms  p95={r['p95_ms']}ms  p99={r['p99_ms']}ms  errors={r['errors']}")
+    print("\n" + pd.DataFrame(res["summary"]["steps"]).to_string(index=False))
+    print("\nupstream calls: " + ", ".join(f"{k}={v}" for k, v in res["summary"]["upstream"]["by_service"].items()))
+    if res["summary"]["upstream"]["injected_errors"]:
+        print("injected errors: " + json.dumps(res["summary"]["upstream"]["injected_errors"]))
+    for f in res["summary"]["failures"]: print(f"  ! {f}")
+
+
+# ---------------------------------------------------------
+# 결과 비교
+# ---------------------------------------------------------
+def compare(base_path, new_path, threshold):
+    base, new = (json.loads(Path(p).read_text()) for p in (base_path, new_path))
+    print(f"base {base['meta']['commit'][:10]} ({base['meta']['subject']})")
+    print(f"new  {new['meta']['commit'][:10]} ({new['meta']['subject']})\n")
+    key = ["persona", "step"]
+    b = pd.DataFrame(base["summary"]["steps"]).set_index(key)[["p50", "p95"]]
+    n = pd.DataFrame(new["summary"]["steps"]).set_index(key)[["p50", "p95"]]
+    t = b.join(n, lsuffix="_base", rsuffix="_new", how="outer")
+    t["p95_delta_%"] = ((t["p95_new"] / t["p95_base"] - 1) * 100).round(1)
+    print(t.to_string())
+
+    rows = [("rerun p50 ms", base["summary"]["reruns"]["p50_ms"], new["summary"]["reruns"]["p50_ms"]),
+            ("rerun p95 ms", base["summary"]["reruns"]["p95_ms"], new["summary"]["reruns"]["p95_ms"]),
+            ("peak rss MB", base["summary"]["peak_rss_mb"], new["summary"]["peak_rss_mb"])]
+    for svc in sorted(set(base["summary"]["upstream"]["by_service"]) | set(new["summary"]["upstream"]["by_service"])):
+        rows.append((f"{svc} calls", base["summary"]["upstream"]["by_service"].get(svc, 0),
+                     new["summary"]["upstream"]["by_service"].get(svc, 0)))
+    print()
+    regressed = []
+    for name, x, y in rows:
+        delta = (y / x - 1) if x else (1.0 if y else 0.0)
+        flag = "  ← REGRESSION" if delta > threshold else ""
+        if flag: regressed.append(name)
+        print(f"{name:<18}{x:>12}{y:>12}{delta * 100:>+9.1f}%{flag}")
+    return 1 if regressed else 0
+
+
+def latest_result(exclude=None):
+    files = sorted(p for p in RESULTS_DIR.glob("*.json") if p != exclude)
+    return files[-1] if files else None
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sessions", type=int, default=8, help="동시 세션 수 (persona 는 순서대로 배정)")
+    ap.add_argument("--rounds", type=int, default=2, help="반복 횟수 (첫 회차는 cold cache)")
+    ap.add_argument("--latency", default="supabase=0.02,fmp=0.05,openai=0.2", help="서비스별 지연(초)")
+    ap.add_argument("--error-rate", default="0", help="서비스별 오류율 (0~1)")
+    ap.add_argument("--chunk-delay", type=float, default=0.01, help="OpenAI 스트림 청크 간격(초)")
+    ap.add_argument("--ad-seconds", type=float, default=0.0, help="free 사용자 광고 시간 (운영값 5)")
+    ap.add_argument("--seed-users", type=int, default=200)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--timeout", type=float, default=120)
+    ap.add_argument("--settle", type=float, default=3.0)
+    ap.add_argument("--label", default="")
+    ap.add_argument("--no-save", action="store_true")
+    ap.add_argument("--baseline", help="비교할 결과 파일 (기본: 직전 결과)")
+    ap.add_argument("--threshold", type=float, default=0.2, help="회귀로 표시할 증가율")
+    ap.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="저장된 두 결과만 비교")
+    args = ap.parse_args()
+
+    if args.compare:
+        sys.exit(compare(*args.compare, args.threshold))
+
+    cfg = {"sessions": args.sessions, "rounds": args.rounds, "latency": parse_map(args.latency),
+           "error_rate": parse_map(args.error_rate), "chunk_delay": args.chunk_delay, "ad_seconds": args.ad_seconds,
+           "seed_users": args.seed_users, "seed": args.seed, "timeout": args.timeout, "settle": args.settle}
+    with get_context("spawn").Pool(1) as pool:
+        raw = pool.apply(run_trial, (cfg,))
+    result = {"meta": git_meta() | {"label": args.label, "at": datetime.now().isoformat(timespec="seconds"),
+                                    "python": platform.python_version()},
+              "config": cfg, "summary": summarize(raw), "samples": raw["samples"]}
+    print_report(result)
+
+    baseline = Path(args.baseline) if args.baseline else latest_result()
+    if not args.no_save:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        name = datetime.now().strftime("%Y%m%d-%H%M%S") + f"-{result['meta']['commit'][:8] or 'nogit'}"
+        out = RESULTS_DIR / f"{name}{'-' + args.label if args.label else ''}.json"
+        out.write_text(json.dumps(result, ensure_ascii=False, indent=1, default=str))
+        print(f"\nsaved {out.relative_to(ROOT)}")
+        if baseline:
+            print()
+            sys.exit(compare(baseline, out, args.threshold))
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    main()
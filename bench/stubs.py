@@ -0,0 +1,274 @@
+"""Supabase / FMP / OpenAI 로컬 대역 서버.
+
+하나의 ThreadingHTTPServer 가 경로로 서비스를 구분합니다.
+  /rest/v1/*, /auth/*   → Supabase (PostgREST 필터 일부 + RPC)
+  /stable/*             → FMP
+  /v1/*                 → OpenAI chat completions (SSE 스트리밍 포함)
+서비스별 지연(초)과 오류율을 주입할 수 있고, 호출 수를 경로별로 셉니다.
+"""
+import base64, json, random, re, threading, time, uuid, zlib
+from datetime import date, datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+SERVICES = ("supabase", "fmp", "openai")
+SYMBOLS = ["AAPL", "AMD", "AMZN", "GOOGL", "META", "MSFT", "MU", "NVDA", "TSLA", "SPY", "QQQ", "DIA"]
+REPORT_TEXT = ("## 1.예측승률\n62%\n\n## 2.핵심근거\n- 수요 회복\n- 마진 개선\n\n"
+               "## 3.리스크\n- 밸류에이션 부담\n\n## 4.목표가\n+12%\n\n## 5.최종결론\n매수 우위.\n[VERDICT: BUY]")
+
+
+def _quote(sym):
+    h = sum(map(ord, sym))
+    return {"symbol": sym, "name": f"{sym} Corp", "price": 50.0 + h % 400, "changePercentage": (h % 7) - 3.0,
+            "marketCap": 1e9 * (h % 90 + 1), "yearHigh": 60.0 + h % 400, "pe": 10 + h % 30, "timestamp": int(time.time())}
+
+
+def _history(sym, start, end):
+    rows, d, base = [], start, sum(map(ord, sym)) % 50
+    while d <= end:
+        if d.weekday() < 5:
+            px = 100 + base + 10 * ((d.toordinal() % 37) / 37)
+            rows.append({"symbol": sym, "date": str(d), "open": px, "high": px * 1.01, "low": px * 0.99,
+                         "close": px, "volume": 1000000})
+        d += timedelta(days=1)
+    return rows[::-1]
+
+
+class StubServer:
+    def __init__(self, latency=None, error_rate=None, chunk_delay=0.01):
+        # latency / error_rate: {"supabase": 0.02, "fmp": 0.05, "openai": 0.3} 형식
+        self.latency = dict.fromkeys(SERVICES, 0.0) | (latency or {})
+        self.error_rate = dict.fromkeys(SERVICES, 0.0) | (error_rate or {})
+        self.chunk_delay = chunk_delay
+        self.calls = {}
+        self.errors = {}
+        self.lock = threading.Lock()
+        self.tables = {"profiles": [], "predictions": [], "announcements": [], "points_ledger": [], "reports": []}
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _count(self, bucket, key):
+        with self.lock: bucket[key] = bucket.get(key, 0) + 1
+
+    def seed(self, users=200, announcements=40, predictions=500):
+        now = datetime.utcnow()
+        with self.lock:
+            for i in range(users):
+                self.tables["profiles"].append({
+                    "id": f"seed-{i:05d}", "email": f"analyst{i}@example.com", "nickname": f"analyst{i}",
+                    "subscription_type": "premium" if i % 5 == 0 else "free", "points": (i * 37) % 1000,
+                    "referral_code": f"R{i:06d}", "is_onboarded": True, "referred_by": None,
+                    "created_at": (now - timedelta(days=i)).isoformat()})
+            for i in range(announcements):
+                self.tables["announcements"].append({
+                    "id": i + 1, "content": f"공지 #{i + 1}", "created_at": (now - timedelta(hours=i)).isoformat()})
+            for i in range(predictions):
+                created = now - timedelta(days=i % 180)
+                self.tables["predictions"].append({
+                    "id": str(uuid.uuid4()), "user_id": f"seed-{i % users:05d}", "ticker": SYMBOLS[i % len(SYMBOLS)],
+                    "price": 100.0, "verdict": ("BUY", "SELL", "HOLD")[i % 3], "created_at": created.isoformat(),
+                    "target_date": str((created + timedelta(days=90)).date())})
+
+    def add_profile(self, profile):
+        with self.lock:
+            if not any(r["id"] == profile["id"] for r in self.tables["profiles"]):
+                self.tables["profiles"].append(dict(profile))
+
+    def add_reports(self, user_id, n):
+        # MY REPORTS 페이지 넘김을 재려고 사용자별 과거 리포트를 채움
+        now, body_z = datetime.utcnow(), base64.b64encode(zlib.compress(REPORT_TEXT.encode(), 9)).decode()
+        with self.lock:
+            if any(r["user_id"] == user_id for r in self.tables["reports"]): return
+            for i in range(n):
+                self.tables["reports"].append({
+                    "id": str(uuid.uuid4()), "user_id": user_id, "ticker": SYMBOLS[i % len(SYMBOLS)], "verdict": "BUY",
+                    "tier": "premium", "model": "gpt-4o", "snapshot": {"quote": _quote(SYMBOLS[i % len(SYMBOLS)])},
+                    "body_z": body_z, "created_at": (now - timedelta(hours=i)).isoformat()})
+
+    def _handler(stub):
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args): pass
+
+            def _send(self, code, body, headers=None):
+                data = body if isinstance(body, bytes) else json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in (headers or {}).items(): self.send_header(k, v)
+                self.end_headers()
+                if self.command != "HEAD": self.wfile.write(data)
+
+            def _body(self):
+                n = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(n)) if n else None
+
+            def do_GET(self): self.route()
+            def do_POST(self): self.route()
+            def do_PATCH(self): self.route()
+            def do_DELETE(self): self.route()
+            def do_HEAD(self): self.route()
+
+            def route(self):
+                u = urlparse(self.path)
+                svc = "fmp" if u.path.startswith("/stable/") else "openai" if u.path.startswith("/v1/") else "supabase"
+                stub._count(stub.calls, f"{svc} {self.command} {u.path}")
+                body = self._body() if self.command in ("POST", "PATCH") else None
+                if stub.latency[svc]: time.sleep(stub.latency[svc] * random.uniform(0.5, 1.5))
+                if random.random() < stub.error_rate[svc]:
+                    stub._count(stub.errors, svc)
+                    return self._send(503, {"error": "injected"})
+                if svc == "fmp": return self.fmp(u.path[len("/stable/"):], parse_qs(u.query))
+                if svc == "openai": return self.openai(body or {})
+                return self.rest(u, body)
+
+            # ── FMP ──
+            def fmp(self, ep, q):
+                arg = lambda k, d="": q.get(k, [d])[0]
+                if ep == "quote":
+                    sym = arg("symbol")
+                    return self._send(200, [_quote(sym)] if sym in SYMBOLS else [])
+                if ep == "batch-quote":
+                    return self._send(200, [_quote(s) for s in arg("symbols").split(",") if s in SYMBOLS])
+                if ep.startswith("historical-price-eod"):
+                    end = date.fromisoformat(arg("to", str(date.today())))
+                    start = date.fromisoformat(arg("from", str(end - timedelta(days=3650))))
+                    return self._send(200, _history(arg("symbol"), start, end) if arg("symbol") in SYMBOLS else [])
+                if ep == "stock-list":
+                    return self._send(200, [{"symbol": s, "companyName": f"{s} Corp"} for s in SYMBOLS])
+                if ep == "profile":
+                    return self._send(200, [{"symbol": arg("symbol"), "sector": "Technology", "industry": "Semiconductors", "beta": 1.2}])
+                if ep == "news/stock":
+                    return self._send(200, [{"title": f"{arg('symbols')} headline {i}", "publishedDate": "2026-01-01"} for i in range(5)])
+                return self._send(200, [])
+
+            # ── OpenAI ──
+            def openai(self, body):
+                usage = {"prompt_tokens": 400, "completion_tokens": 80, "total_tokens": 480}
+                if not body.get("stream"):
+                    return self._send(200, {"choices": [{"message": {"content": REPORT_TEXT}}], "usage": usage})
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                def chunk(b):
+                    self.wfile.write(f"{len(b):x}\r\n".encode() + b + b"\r\n")
+                    self.wfile.flush()
+                for i in range(0, len(REPORT_TEXT), 16):
+                    ev = {"choices": [{"delta": {"content": REPORT_TEXT[i:i + 16]}}]}
+                    chunk(f"data: {json.dumps(ev)}\n\n".encode())
+                    if stub.chunk_delay: time.sleep(stub.chunk_delay)
+                chunk(f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n".encode())
+                chunk(b"data: [DONE]\n\n")
+                chunk(b"")
+
+            # ── Supabase (PostgREST) ──
+            def rest(self, u, body):
+                if u.path.startswith("/auth/"): return self._send(200, {})
+                path = u.path[len("/rest/v1/"):]
+                if path.startswith("rpc/"): return self.rpc(path[4:], body or {})
+                params = {k: v[0] for k, v in parse_qs(u.query, keep_blank_values=True).items()}
+                filters = {k: v for k, v in params.items() if k not in ("select", "order", "limit", "offset", "on_conflict", "columns")}
+                prefer = self.headers.get("Prefer", "")
+                with stub.lock:
+                    rows = stub.tables.setdefault(path, [])
+                    hit = [r for r in rows if _match(r, filters)]
+                    if self.command in ("GET", "HEAD"):
+                        total = len(hit)
+                        for o in reversed(params.get("order", "").split(",") if params.get("order") else []):
+                            col, *mods = o.split(".")
+                            hit.sort(key=lambda r: (r.get(col) is None, r.get(col)), reverse="desc" in mods)
+                        hit = hit[int(params.get("offset", 0)):]
+                        if "limit" in params: hit = hit[:int(params["limit"])]
+                        if params.get("select", "*") != "*":
+                            cols = params["select"].split(",")
+                            hit = [{c: r.get(c) for c in cols} for r in hit]
+                        hdr = {"Content-Range": f"0-{max(len(hit) - 1, 0)}/{total}"} if "count=exact" in prefer else {}
+                        return self._send(200, hit, hdr)
+                    if self.command == "POST":
+                        out, key = [], params.get("on_conflict", "id")
+                        for item in (body if isinstance(body, list) else [body]):
+                            item = dict(item)
+                            old = next((r for r in rows if key in item and r.get(key) == item[key]), None)
+                            if old is not None and "ignore-duplicates" in prefer: continue
+                            if old is not None and "merge-duplicates" in prefer:
+                                old.update(item); out.append(old); continue
+                            item.setdefault("id", str(uuid.uuid4()))
+                            item.setdefault("created_at", datetime.utcnow().isoformat())
+                            rows.append(item); out.append(item)
+                        return self._send(201, out)
+                    if self.command == "PATCH":
+                        for r in hit: r.update(body)
+                        return self._send(200, hit)
+                    if self.command == "DELETE":
+                        stub.tables[path] = [r for r in rows if r not in hit]
+                        return self._send(200, hit)
+
+            def rpc(self, fn, body):
+                if fn == "award_points":
+                    with stub.lock:
+                        ledger = stub.tables["points_ledger"]
+                        prof = next((r for r in stub.tables["profiles"] if r["id"] == body["p_user_id"]), None)
+                        if prof is None: return self._send(200, None)
+                        if not any(e["user_id"] == prof["id"] and e["ref"] == body["p_ref"] for e in ledger):
+                            ledger.append({"user_id": prof["id"], "delta": body["p_delta"], "reason": body["p_reason"],
+                                           "ref": body["p_ref"], "created_at": datetime.utcnow().isoformat()})
+                            prof["points"] = (prof.get("points") or 0) + body["p_delta"]
+                        return self._send(200, prof["points"])
+                return self._send(200, None)
+
+        return Handler
+
+
+def _split(body):
+    # 괄호 밖의 쉼표로만 나눔: "a.eq.1,and(b.eq.2,c.lt.3)" → 2항
+    out, depth, cur = [], 0, ""
+    for ch in body:
+        depth += (ch == "(") - (ch == ")")
+        if ch == "," and depth == 0:
+            out.append(cur); cur = ""
+        else:
+            cur += ch
+    return out + [cur] if cur else out
+
+
+def _group(row, kind, body):
+    # or=(...) / and(...) 를 재귀적으로 평가
+    hits = []
+    for term in _split(body):
+        m = re.fullmatch(r"(or|and)\((.*)\)", term)
+        if m:
+            hits.append(_group(row, m[1], m[2]))
+        else:
+            col, _, expr = term.partition(".")
+            hits.append(_cond(row, col, expr))
+    return any(hits) if kind == "or" else all(hits)
+
+
+def _cond(row, col, expr):
+    op, _, val = expr.partition(".")
+    x = row.get(col)
+    if op == "eq": return str(x) == val
+    if op == "neq": return str(x) != val
+    if op == "is": return (x is None) == (val == "null")
+    if op == "in": return str(x) in val.strip("()").split(",")
+    if op == "ilike": return val.strip("*").lower() in str(x or "").lower()
+    if op in ("gt", "gte", "lt", "lte"):
+        if x is None: return False
+        a, b = (float(x), float(val)) if isinstance(x, (int, float)) and re.fullmatch(r"-?[\d.]+", val) else (str(x), val)
+        return {"gt": a > b, "gte": a >= b, "lt": a < b, "lte": a <= b}[op]
+    return True
+
+
+def _match(row, filters):
+    for col, expr in filters.items():
+        ok = _group(row, col, expr.strip()[1:-1]) if col in ("or", "and") else _cond(row, col, expr)
+        if not ok: return False
+    return True
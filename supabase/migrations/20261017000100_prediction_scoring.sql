@@ -0,0 +1,10 @@
+-- 만기 도래 예측 채점 결과 (run_prediction_scoring)
+alter table predictions
+    add column if not exists close_price double precision,
+    add column if not exists return_pct  double precision,
+    add column if not exists hit         boolean,
+    add column if not exists scored_at   timestamptz;
+
+-- 채점 대상 조회: target_date <= today and scored_at is null
+create index if not exists predictions_unscored_idx
+    on predictions (target_date, id) where scored_at is null;
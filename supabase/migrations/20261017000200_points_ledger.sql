@@ -0,0 +1,57 @@
+-- 포인트 원장 (append-only) + profiles.points 는 원장 합계의 물리화 값
+create table if not exists points_ledger (
+    id         bigint generated always as identity primary key,
+    user_id    uuid        not null references profiles (id) on delete cascade,
+    delta      integer     not null,
+    reason     text        not null,
+    ref        text        not null,   -- 클라이언트가 만든 지급 키: 재시도해도 한 번만 반영
+    created_at timestamptz not null default now(),
+    unique (user_id, ref)
+);
+
+create index if not exists points_ledger_user_idx on points_ledger (user_id, created_at desc);
+
+-- 원장은 지급 함수로만 기록 (수정 · 삭제 불가)
+alter table points_ledger enable row level security;
+drop policy if exists points_ledger_read_own on points_ledger;
+create policy points_ledger_read_own on points_ledger for select using (auth.uid() = user_id);
+
+-- 원장 기록과 합계 증가를 한 트랜잭션에서 처리하고 새 합계를 반환
+-- 같은 (user_id, ref) 가 다시 오면 아무것도 바꾸지 않고 현재 합계만 반환
+create or replace function award_points(p_user_id uuid, p_delta integer, p_reason text, p_ref text)
+returns integer
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    total integer;
+begin
+    insert into points_ledger (user_id, delta, reason, ref)
+    values (p_user_id, p_delta, p_reason, p_ref)
+    on conflict (user_id, ref) do nothing;
+
+    if found then
+        update profiles set points = coalesce(points, 0) + p_delta
+        where id = p_user_id
+        returning points into total;
+    else
+        select points into total from profiles where id = p_user_id;
+    end if;
+    return total;
+end;
+$$;
+
+-- security definer 이므로 지급은 서버 (service_role 키를 쓰는 write-behind) 만 호출 가능
+revoke all on function award_points(uuid, integer, text, text) from public, anon, authenticated;
+grant execute on function award_points(uuid, integer, text, text) to service_role;
+
+-- 기존 누적 포인트를 원장 시작 잔액으로 이관
+insert into points_ledger (user_id, delta, reason, ref)
+select id, points, 'opening_balance', 'opening_balance'
+from profiles
+where coalesce(points, 0) <> 0
+on conflict (user_id, ref) do nothing;
+
+-- 랭킹 조회 (points desc)
+create index if not exists profiles_points_idx on profiles (points desc, id);
@@ -0,0 +1,24 @@
+-- 사용자별 리포트 기록: 본문은 zlib + base64 로 압축해서 보관
+create table if not exists reports (
+    id         uuid        primary key default gen_random_uuid(),
+    user_id    uuid        not null references profiles (id) on delete cascade,
+    ticker     text        not null,
+    verdict    text,
+    tier       text        not null,
+    model      text        not null,
+    snapshot   jsonb,               -- 생성 당시 시세 · 기술적 지표
+    body_z     text        not null,
+    created_at timestamptz not null default now()
+);
+
+-- MY REPORTS: user_id 로 거르고 (created_at, id) 내림차순 keyset — 같은 시각 (한 flush 배치) 은 id 로 구분
+create index if not exists reports_user_created_idx on reports (user_id, created_at desc, id desc);
+
+alter table reports enable row level security;
+drop policy if exists reports_own on reports;
+-- 쓰기는 서버 write-behind (service_role, RLS 우회) 만 → 사용자에게는 본인 행 조회만 허용
+create policy reports_own on reports for select using (auth.uid() = user_id);
+
+-- 예측 → 근거 리포트
+alter table predictions
+    add column if not exists report_id uuid references reports (id) on delete set null;
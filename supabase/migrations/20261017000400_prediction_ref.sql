@@ -0,0 +1,6 @@
+-- write-behind 재시도 멱등성: 예측 행마다 클라이언트가 만든 키
+-- 커밋 뒤 응답만 놓쳐 다시 보내도 (on conflict (ref) do nothing) 한 행만 남음 → 중복 채점 방지
+alter table predictions
+    add column if not exists ref uuid;
+
+create unique index if not exists predictions_ref_key on predictions (ref);